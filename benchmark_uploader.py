@@ -0,0 +1,290 @@
+"""
+Benchmark ScreenshotUploader against the in-process fake Drive
+
+Generates a synthetic folder of JPEG captures, runs the uploader's
+phases against fake_drive.FakeDrive and reports:
+
+- scan time (local scan + Drive scan), plan time (hash + diff)
+- upload throughput in files/s and MB/s
+- peak RSS
+- retry overhead (extra attempts, backoff seconds, injected faults)
+
+Results can be saved as a baseline and later runs with the same settings
+are compared against it, so regressions are visible.
+
+Examples:
+    python benchmark_uploader.py --files 1000
+    python benchmark_uploader.py --files 10000 --workers 8 --latency-ms 40 --throttle-rate 0.02
+    python benchmark_uploader.py --files 1000 --save-baseline
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import fixed_uploader
+from fake_drive import FakeDrive
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(SCRIPT_DIR, "benchmark_baselines.json")
+REGRESSION_THRESHOLD = 0.10  # Flag metrics that got more than 10% worse than the baseline
+NOISE_FLOOR_SECONDS = 0.05  # Timing differences smaller than this are never flagged
+
+# Metrics where bigger is better; everything else timed is smaller-is-better
+HIGHER_IS_BETTER = {"upload_files_per_second", "upload_mb_per_second"}
+COMPARED_METRICS = ["scan_seconds", "plan_seconds", "upload_seconds", "upload_files_per_second",
+                    "upload_mb_per_second", "peak_rss_mb", "retry_backoff_seconds"]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark the screenshot uploader against a fake Drive')
+    parser.add_argument('--files', type=int, default=1000,
+                       help='Number of synthetic screenshots to generate (default: 1000)')
+    parser.add_argument('--size-kb', type=int, default=100,
+                       help='Average screenshot size in KB (default: 100)')
+    parser.add_argument('--already-in-drive', type=float, default=0.0,
+                       help='Fraction of files that already exist in Drive (default: 0)')
+    parser.add_argument('--workers', type=fixed_uploader.parse_workers, default=4,
+                       help='Concurrent upload workers, or "auto" for adaptive concurrency (default: 4)')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                       help='Uploads started per second, 0 = unlimited (default: 0)')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                       help='Fake Drive latency per request in ms (default: 0)')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0,
+                       help='Fake Drive upload bandwidth in MB/s, 0 = unlimited (default: 0)')
+    parser.add_argument('--throttle-rate', type=float, default=0,
+                       help='Fraction of requests answered with 429 (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0,
+                       help='Fraction of requests answered with 503 (default: 0)')
+    parser.add_argument('--partition-by-date', action='store_true',
+                       help='Upload into YYYY/MM subfolders (captures are spread over several months)')
+    parser.add_argument('--bundle-small-files', nargs='?', type=int, const=fixed_uploader.BUNDLE_THRESHOLD_KB,
+                       default=None, metavar='KB',
+                       help='Upload files smaller than KB as hourly ZIP bundles (see the uploader flag)')
+    parser.add_argument('--fan-out', action='store_true',
+                       help='Also mirror every file to a second fake Drive folder and a local backup folder')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed for file contents and fault injection (default: 0)')
+    parser.add_argument('--save-baseline', action='store_true',
+                       help=f'Record this run as the baseline in {os.path.basename(BASELINE_FILE)}')
+    parser.add_argument('--keep', action='store_true',
+                       help='Keep the generated folder and logs instead of deleting them')
+    return parser.parse_args()
+
+
+def make_jpeg_bytes(rng, size):
+    """
+    Bytes of a structurally valid JPEG of roughly `size` bytes
+
+    SOI + JFIF header + random comment segments + EOI. Random content
+    keeps every file's MD5 unique, like real captures.
+    """
+    data = bytearray(b"\xff\xd8")  # SOI
+    data += b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"  # APP0
+    remaining = max(size - len(data) - 2, 0)
+    while remaining > 4:
+        payload = min(remaining - 4, 65533)  # Max length of one COM segment
+        data += b"\xff\xfe" + (payload + 2).to_bytes(2, 'big') + rng.randbytes(payload)
+        remaining -= payload + 4
+    data += b"\xff\xd9"  # EOI
+    return bytes(data)
+
+
+def generate_screenshots(folder, count, size_kb, seed, spacing=1):
+    """
+    Write `count` synthetic captures with increasing mtimes, `spacing` seconds apart
+
+    Returns:
+        dict: filename -> bytes for a sample of files (used to pre-populate Drive)
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    base_time = time.time() - count * spacing
+    contents = {}
+
+    for i in range(count):
+        size = int(size_kb * 1024 * rng.uniform(0.5, 1.5))
+        filename = f"Captura de pantalla {i:06d}.jpg"
+        data = make_jpeg_bytes(rng, size)
+        path = os.path.join(folder, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (base_time + i * spacing, base_time + i * spacing))
+        contents[filename] = data
+
+    return contents
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None if it can't be measured)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def run_benchmark(args, work_dir):
+    """Run the uploader's phases against a fake Drive and collect metrics"""
+    local_folder = os.path.join(work_dir, "screenshots")
+    print(f"Generating {args.files} synthetic screenshots (~{args.size_kb} KB each)...")
+    generate_start = time.time()
+    # Partitioned runs spread the captures over about a year so they land in ~12 month folders
+    spacing = 365 * 24 * 3600 / args.files if args.partition_by_date else 1
+    contents = generate_screenshots(local_folder, args.files, args.size_kb, args.seed, spacing)
+    print(f"Generated in {time.time() - generate_start:.1f}s")
+
+    fake = FakeDrive(latency=args.latency_ms / 1000, bandwidth_mbps=args.bandwidth_mbps,
+                     throttle_rate=args.throttle_rate, error_rate=args.error_rate, seed=args.seed)
+
+    # Pre-populate Drive with the same bytes for part of the folder
+    existing = int(args.files * args.already_in_drive)
+    for filename in list(contents)[:existing]:
+        fake.add_file(filename, fixed_uploader.DRIVE_FOLDER_ID, contents[filename])
+    contents.clear()  # Don't count the generator's copies in the peak RSS of later runs
+
+    # Point every uploader path at the temp folder
+    fixed_uploader.LOCAL_FOLDER = local_folder
+    fixed_uploader.DETAILED_LOG_PATH = os.path.join(work_dir, "detailed_execution_log.jsonl")
+    fixed_uploader.EXECUTION_LOG_PATH = os.path.join(work_dir, "execution_log.txt")
+
+    results = {}
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        uploader = fixed_uploader.ScreenshotUploader()
+        uploader.silent_mode = True
+        uploader.drive_backend = fake.client
+        if args.workers is None:
+            uploader.adaptive_concurrency = True
+            uploader.workers = fixed_uploader.ADAPTIVE_MAX_WORKERS
+        else:
+            uploader.workers = args.workers
+        uploader.rate_limit = args.rate_limit
+        uploader.partition_by_date = args.partition_by_date
+        if args.bundle_small_files:
+            uploader.bundle_threshold = args.bundle_small_files * 1024
+        if args.fan_out:
+            uploader.destinations = [fixed_uploader.DriveMirrorSink("fake-mirror-folder"),
+                                     fixed_uploader.LocalBackupSink(os.path.join(work_dir, "backup"))]
+
+        phase_start = time.time()
+        changed = uploader.scan_local_changes()
+        uploader.authenticate_google_drive()
+        uploader.scan_google_drive_folder()
+        results["scan_seconds"] = round(time.time() - phase_start, 3)
+
+        phase_start = time.time()
+        missing = uploader.get_missing_screenshots(changed)
+        results["plan_seconds"] = round(time.time() - phase_start, 3)
+
+        phase_start = time.time()
+        uploader.upload_multiple_screenshots(missing)
+        upload_time = time.time() - phase_start
+        results["upload_seconds"] = round(upload_time, 3)
+
+    details = uploader.last_batch_details
+    uploaded = [d for d in details if d["success"]]
+    uploaded_mb = sum(d["size_mb"] for d in uploaded)
+
+    results.update({
+        "files_scanned": uploader.local_file_count,
+        "files_uploaded": len(uploaded),
+        "files_failed": sum(1 for d in details if not d["success"] and not d.get("deferred")),
+        "uploaded_mb": round(uploaded_mb, 2),
+        "upload_files_per_second": round(len(uploaded) / upload_time, 2) if upload_time > 0 else None,
+        "upload_mb_per_second": round(uploaded_mb / upload_time, 2) if upload_time > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "retry_attempts": sum(max(0, d["upload_attempts"] - 1) for d in details),
+        "retry_backoff_seconds": round(sum(d.get("backoff_seconds", 0) for d in details), 2),
+        "concurrency_final": uploader.last_concurrency["final"],
+        "concurrency_peak": uploader.last_concurrency["peak"],
+        "fake_drive": dict(fake.stats)
+    })
+    return results
+
+
+def config_key(args):
+    """Settings that must match for two runs to be comparable"""
+    return (f"files={args.files},size_kb={args.size_kb},in_drive={args.already_in_drive},"
+            f"workers={args.workers or 'auto'},rate={args.rate_limit},latency_ms={args.latency_ms},"
+            f"bandwidth={args.bandwidth_mbps},throttle={args.throttle_rate},errors={args.error_rate}"
+            + (",partitioned" if args.partition_by_date else "")
+            + (f",bundle_kb={args.bundle_small_files}" if args.bundle_small_files else "")
+            + (",fan_out" if args.fan_out else ""))
+
+
+def compare_with_baseline(key, results):
+    """Print how this run compares with the saved baseline for the same settings"""
+    if not os.path.exists(BASELINE_FILE):
+        print("\nNo baselines recorded yet (use --save-baseline)")
+        return
+
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f).get(key)
+    if not baseline:
+        print("\nNo baseline for these settings yet (use --save-baseline)")
+        return
+
+    print(f"\nCompared with baseline from {baseline['timestamp']}:")
+    for metric in COMPARED_METRICS:
+        old, new = baseline["results"].get(metric), results.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        if metric.endswith("_seconds") and abs(new - old) < NOISE_FLOOR_SECONDS:
+            worse = 0  # Too small to be more than timer noise
+        flag = "  ⚠️ REGRESSION" if worse > REGRESSION_THRESHOLD else ""
+        print(f"  {metric:26s} {old:>10} -> {new:>10} ({change * 100:+.1f}%){flag}")
+
+
+def save_baseline(key, results):
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+    baselines[key] = {"timestamp": datetime.now().isoformat(timespec='seconds'), "results": results}
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2)
+    print(f"\nBaseline saved to {BASELINE_FILE}")
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix="uploader_bench_")
+    original_cwd = os.getcwd()
+
+    try:
+        # upload_log.json and the other state files are relative to the working directory
+        os.chdir(work_dir)
+        results = run_benchmark(args, work_dir)
+    finally:
+        os.chdir(original_cwd)
+        if args.keep:
+            print(f"Benchmark files kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\nBenchmark results:")
+    print(json.dumps(results, indent=2))
+
+    key = config_key(args)
+    compare_with_baseline(key, results)
+    if args.save_baseline:
+        save_baseline(key, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+In-process fake Google Drive for benchmarks and offline runs
+
+FakeDrive keeps files, resumable upload sessions and a change feed in
+memory and hands out clients with the same shape as the Drive v3 client
+that ScreenshotUploader uses:
+
+    service.files().list(...).execute()
+    service.files().create(..., media_body=MediaFileUpload(..., resumable=True)).next_chunk()
+    service.files().update(fileId=..., media_body=...).next_chunk()
+    service.changes().getStartPageToken().execute()
+    service.changes().list(pageToken=...).execute()
+    service.new_batch_http_request()  (metadata-only calls)
+
+Plug it in with:
+
+    fake = FakeDrive(latency=0.05, throttle_rate=0.02)
+    uploader.drive_backend = fake.client
+
+Latency, bandwidth, throttling (429 with Retry-After) and server errors
+(503) can be injected to see how the uploader behaves under them.
+
+The Google client libraries are optional here: without them, stand-ins
+for HttpError and the media upload classes are used (google_stand_ins).
+"""
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+except ImportError:
+    # No Google client libraries (bare checkout): minimal stand-ins with the
+    # interface the uploader and this module use, so tests still run
+    class HttpError(Exception):
+        """Stand-in for googleapiclient.errors.HttpError (resp.status, resp headers, content)"""
+        def __init__(self, resp, content, uri=None):
+            self.resp = resp
+            self.content = content
+            self.uri = uri
+            self.status_code = resp.status
+            try:
+                self.reason = json.loads(content.decode('utf-8'))["error"]["message"]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.reason = resp.reason
+            super().__init__(str(self))
+
+        def __str__(self):
+            return f'<HttpError {self.resp.status} when requesting {self.uri} returned "{self.reason}">'
+
+    class MediaIoBaseUpload:
+        """Stand-in for googleapiclient.http.MediaIoBaseUpload over a seekable file object"""
+        def __init__(self, fd, mimetype, chunksize=100 * 1024 * 1024, resumable=False):
+            self._fd = fd
+            self._mimetype = mimetype
+            self._chunksize = chunksize
+            self._resumable = resumable
+            fd.seek(0, 2)
+            self._size = fd.tell()
+
+        def chunksize(self):
+            return self._chunksize
+
+        def mimetype(self):
+            return self._mimetype
+
+        def size(self):
+            return self._size
+
+        def resumable(self):
+            return self._resumable
+
+        def getbytes(self, begin, length):
+            self._fd.seek(begin)
+            return self._fd.read(length)
+
+    class MediaFileUpload(MediaIoBaseUpload):
+        """Stand-in for googleapiclient.http.MediaFileUpload"""
+        def __init__(self, filename, mimetype=None, chunksize=100 * 1024 * 1024, resumable=False):
+            self._filename = filename
+            super().__init__(open(filename, 'rb'), mimetype or "application/octet-stream",
+                             chunksize, resumable)
+
+
+class FakeResponse(dict):
+    """Minimal stand-in for the httplib2.Response that HttpError expects"""
+    def __init__(self, status, headers=None):
+        super().__init__(headers or {})
+        self.status = status
+        self.reason = {429: "Too Many Requests", 404: "Not Found",
+                       503: "Service Unavailable"}.get(status, "Error")
+
+
+def make_http_error(status, message, retry_after=None):
+    """Build an HttpError that looks like one from the real Drive API"""
+    headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+    content = json.dumps({"error": {"code": status, "message": message}}).encode('utf-8')
+    return HttpError(FakeResponse(status, headers), content, uri="fake://drive")
+
+
+class FakeDrive:
+    """
+    Shared in-memory Drive state plus fault injection settings
+
+    Args:
+        latency (float): Seconds added to every request (round trip time)
+        bandwidth_mbps (float): Upload speed in MB/s (0 = unlimited)
+        throttle_rate (float): Chance (0-1) a request gets a 429 rate limit
+        error_rate (float): Chance (0-1) a request gets a 503 server error
+        retry_after (float): Retry-After seconds sent with 429 responses
+        fail_names (set): Filenames whose uploads always fail with 503
+        seed (int): Random seed so runs are repeatable
+    """
+    def __init__(self, latency=0.0, bandwidth_mbps=0.0, throttle_rate=0.0, error_rate=0.0,
+                 retry_after=0.1, fail_names=None, seed=0):
+        self.latency = latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.fail_names = set(fail_names or ())
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.files = {}  # id -> file resource dict
+        self.changes = []  # Change feed; a page token is an index into this list
+        self.sessions = {}  # resumable session URI -> {"data"} while open, {"result"} once finished
+        self.ids = itertools.count(1)
+
+        # Counters the benchmark reports
+        self.stats = {"requests": 0, "throttled": 0, "server_errors": 0,
+                      "bytes_received": 0, "files_created": 0}
+
+    def client(self):
+        """New Drive v3-shaped client (one per worker thread, like the real one)"""
+        return FakeDriveService(self)
+
+    def add_file(self, name, parent, data=b"", created=None):
+        """Put a file straight into the fake Drive (for pre-populating a folder)"""
+        with self.lock:
+            return self.store_file(None, {'name': name, 'parents': [parent]}, data, created)
+
+    def store_file(self, file_id, body, data, created=None):
+        """Create or replace a file; caller holds the lock"""
+        if file_id is None:
+            file_id = f"fake{next(self.ids)}"
+            self.stats["files_created"] += 1
+            resource = {
+                'id': file_id,
+                'name': body.get('name'),
+                'parents': list(body.get('parents', [])),
+                'createdTime': created or datetime.now(timezone.utc).isoformat(),
+                'trashed': False
+            }
+            if body.get('mimeType'):
+                resource['mimeType'] = body['mimeType']
+        else:
+            resource = self.files[file_id]
+            if body.get('name'):
+                resource['name'] = body['name']
+        resource['size'] = str(len(data))
+        resource['md5Checksum'] = hashlib.md5(data).hexdigest()
+        self.files[file_id] = resource
+        self.changes.append({'fileId': file_id, 'removed': False, 'file': dict(resource)})
+        return dict(resource)
+
+    def request(self, name=None):
+        """
+        Simulate one HTTP round trip: latency plus injected faults
+
+        Raises:
+            HttpError: 429 or 503 when a fault is injected
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            roll = self.random.random()
+            if name in self.fail_names:
+                roll = -1  # Always fails
+        if self.latency:
+            time.sleep(self.latency)
+
+        if roll < 0 or roll < self.error_rate:
+            with self.lock:
+                self.stats["server_errors"] += 1
+            raise make_http_error(503, "Backend Error")
+        if roll < self.error_rate + self.throttle_rate:
+            with self.lock:
+                self.stats["throttled"] += 1
+            raise make_http_error(429, "Rate Limit Exceeded", self.retry_after)
+
+    def transfer(self, byte_count):
+        """Simulate sending `byte_count` bytes at the configured bandwidth"""
+        if self.bandwidth_mbps:
+            time.sleep(byte_count / (self.bandwidth_mbps * 1024 * 1024))
+        with self.lock:
+            self.stats["bytes_received"] += byte_count
+
+
+class FakeRequest:
+    """A request whose execute() runs a function after the simulated round trip"""
+    def __init__(self, drive, func, name=None):
+        self.drive = drive
+        self.func = func
+        self.name = name
+
+    def execute(self, *args, **kwargs):
+        self.drive.request(self.name)
+        return self.func()
+
+
+class FakeBatchRequest:
+    """
+    Same interface as googleapiclient's BatchHttpRequest
+
+    The whole batch costs one simulated round trip; each call inside it
+    can still fail on its own and is reported through its callback.
+    """
+    def __init__(self, drive, callback=None):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self.requests) >= 100:
+            raise ValueError("Drive batches are limited to 100 calls")
+        request_id = request_id or str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self, *args, **kwargs):
+        self.drive.request()
+        for request_id, request, callback in self.requests:
+            response, exception = None, None
+            try:
+                response = request.func()
+            except HttpError as error:
+                exception = error
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeMediaUploadProgress:
+    """Same attributes as googleapiclient.http.MediaUploadProgress"""
+    def __init__(self, resumable_progress, total_size):
+        self.resumable_progress = resumable_progress
+        self.total_size = total_size
+
+    def progress(self):
+        return self.resumable_progress / self.total_size if self.total_size else 0.0
+
+
+class FakeHttp:
+    """
+    The request.http object uploads are sent over
+
+    Only answers resumable session status queries (empty PUT with
+    'Content-Range: bytes */size'), the way Drive does: 308 with a Range
+    header while incomplete, 200 with the file once finished, 404 if the
+    session is unknown.
+    """
+    def __init__(self, drive):
+        self.drive = drive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        drive = self.drive
+        drive.request()
+        with drive.lock:
+            session = drive.sessions.get(uri)
+            if method != "PUT" or session is None:
+                return FakeResponse(404), b'{"error": {"code": 404, "message": "Not Found"}}'
+            if "result" in session:
+                return FakeResponse(200), json.dumps(session["result"]).encode('utf-8')
+            committed = len(session["data"])
+        resp = FakeResponse(308, {'range': f"bytes=0-{committed - 1}"} if committed else {})
+        return resp, b''
+
+
+class FakeUploadRequest:
+    """
+    Resumable upload request with googleapiclient's HttpRequest interface
+
+    Supports next_chunk(), and the public http, resumable_uri and
+    resumable_progress attributes the uploader uses to resume a session.
+    """
+    def __init__(self, drive, body, media, file_id=None):
+        self.drive = drive
+        self.http = FakeHttp(drive)
+        self.body = body or {}
+        self.media = media
+        self.file_id = file_id
+        self.resumable_uri = None
+        self.resumable_progress = 0
+
+    def execute(self, *args, **kwargs):
+        response = None
+        while response is None:
+            _, response = self.next_chunk()
+        return response
+
+    def next_chunk(self, *args, **kwargs):
+        drive = self.drive
+        name = self.body.get('name') or drive.files.get(self.file_id, {}).get('name')
+        total_size = self.media.size()
+
+        if self.resumable_uri is None:
+            # Session start request
+            drive.request(name)
+            with drive.lock:
+                self.resumable_uri = f"fake://upload/{next(drive.ids)}"
+                drive.sessions[self.resumable_uri] = {"data": bytearray()}
+
+        drive.request(name)
+        chunk = self.media.getbytes(self.resumable_progress, self.media.chunksize())
+        drive.transfer(len(chunk))
+
+        with drive.lock:
+            session = drive.sessions.get(self.resumable_uri)
+            if session is None or "result" in session:
+                raise make_http_error(404, "Upload session not found")
+            del session["data"][self.resumable_progress:]
+            session["data"] += chunk
+            self.resumable_progress = len(session["data"])
+
+            if self.resumable_progress < total_size:
+                return FakeMediaUploadProgress(self.resumable_progress, total_size), None
+
+            data = bytes(session.pop("data"))
+            # Like Drive, keep the MIME type the client declared for the content
+            body = dict(self.body, mimeType=self.media.mimetype()) if self.file_id is None else self.body
+            resource = drive.store_file(self.file_id, body, data)
+            # A finished session keeps answering status queries with the file
+            session["result"] = {'id': resource['id'], 'md5Checksum': resource['md5Checksum']}
+        return None, dict(session["result"])
+
+
+class FakeFilesResource:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", pageSize=100, pageToken=None, fields=None, **kwargs):
+        drive = self.drive
+        parent = re.search(r"'([^']+)' in parents", q or "")
+        name = re.search(r"name\s*=\s*'([^']*)'", q or "")
+        mime = re.search(r"mimeType\s*=\s*'([^']*)'", q or "")
+        not_mime = re.search(r"mimeType\s*!=\s*'([^']*)'", q or "")
+
+        def run():
+            with drive.lock:
+                matches = [dict(f) for f in drive.files.values()
+                           if not f['trashed']
+                           and (not parent or parent.group(1) in f['parents'])
+                           and (not name or f['name'] == name.group(1))
+                           and (not mime or f.get('mimeType') == mime.group(1))
+                           and (not not_mime or f.get('mimeType') != not_mime.group(1))]
+            start = int(pageToken or 0)
+            page = matches[start:start + min(pageSize, 1000)]
+            result = {'files': page}
+            if start + len(page) < len(matches):
+                result['nextPageToken'] = str(start + len(page))
+            return result
+
+        return FakeRequest(drive, run)
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        if media_body is not None:
+            return FakeUploadRequest(self.drive, body, media_body)
+
+        drive = self.drive
+
+        def run():
+            # Metadata-only create (e.g. a folder)
+            with drive.lock:
+                return drive.store_file(None, body or {}, b"")
+
+        return FakeRequest(drive, run, (body or {}).get('name'))
+
+    def update(self, fileId=None, body=None, media_body=None, fields=None, **kwargs):
+        if fileId not in self.drive.files:
+            raise make_http_error(404, f"File not found: {fileId}")
+        return FakeUploadRequest(self.drive, body, media_body, file_id=fileId)
+
+
+class FakeChangesResource:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        drive = self.drive
+        return FakeRequest(drive, lambda: {'startPageToken': str(len(drive.changes))})
+
+    def list(self, pageToken=None, pageSize=100, fields=None, **kwargs):
+        drive = self.drive
+
+        def run():
+            if not str(pageToken).isdigit() or int(pageToken) > len(drive.changes):
+                raise make_http_error(404, "Invalid page token")
+            start = int(pageToken)
+            with drive.lock:
+                page = [dict(c) for c in drive.changes[start:start + min(pageSize, 1000)]]
+                end = len(drive.changes)
+            result = {'changes': page}
+            if start + len(page) < end:
+                result['nextPageToken'] = str(start + len(page))
+            else:
+                result['newStartPageToken'] = str(end)
+            return result
+
+        return FakeRequest(drive, run)
+
+
+class FakeDriveService:
+    """Client object handed to ScreenshotUploader in place of build('drive', 'v3')"""
+    # Used by the uploader when the Google client libraries aren't installed
+    google_stand_ins = {"HttpError": HttpError, "MediaFileUpload": MediaFileUpload,
+                        "MediaIoBaseUpload": MediaIoBaseUpload}
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def files(self):
+        return FakeFilesResource(self.drive)
+
+    def changes(self):
+        return FakeChangesResource(self.drive)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchRequest(self.drive, callback)
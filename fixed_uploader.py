@@ -1,84 +1,1942 @@
 import os
 # print("Current working directory:", os.getcwd())
 import json
-import glob
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
 import sys
 import argparse
 import time
 import random
+import math
+import hashlib
+import mmap
+import threading
+import heapq
+import itertools
+import fnmatch
+import zipfile
+import socket
+import socketserver
+import secrets
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
 
 def parse_arguments(): 
     # argparse is Python's built-in library for handling command line arguments
     parser = argparse.ArgumentParser(description='Screenshot uploader with startup/shutdown modes')
-    # This creates a --mode flag that only accepts 'startup', 'shutdown', or defaults to 'normal'
-    parser.add_argument('--mode', choices=['startup', 'shutdown'], default='normal',
-                       help='Run mode: startup, shutdown, or normal')
+    # This creates a --mode flag that only accepts 'startup', 'shutdown', 'watch', or defaults to 'normal'
+    parser.add_argument('--mode', choices=['startup', 'shutdown', 'watch'], default='normal',
+                       help='Run mode: startup, shutdown, watch (keep running and upload new '
+                            'screenshots as they appear), or normal')
     # This creates a --silent flag that doesn't need a value (it's either there or not)
     parser.add_argument('--silent', action='store_true',
                        help='Run without user confirmation prompts')
+    # Number of parallel upload threads (1 = upload one file at a time like before,
+    # auto = let the throughput/throttling feedback pick it)
+    parser.add_argument('--workers', type=parse_workers, default=1,
+                       help=f'Number of concurrent upload workers, or "auto" to adapt between 1 and '
+                            f'{ADAPTIVE_MAX_WORKERS} based on throughput and rate limiting (default: 1)')
+    # Shared cap on how many uploads per second we start, across all workers
+    parser.add_argument('--rate-limit', type=float, default=UPLOAD_RATE_LIMIT,
+                       help=f'Maximum uploads started per second (default: {UPLOAD_RATE_LIMIT})')
+    # Size of each resumable upload chunk - a failed upload resumes from the last chunk sent
+    parser.add_argument('--chunk-size', type=int, default=UPLOAD_CHUNK_SIZE_MB,
+                       help=f'Resumable upload chunk size in MB (default: {UPLOAD_CHUNK_SIZE_MB})')
+    # Print upload statistics from the detailed log instead of uploading
+    parser.add_argument('--stats', action='store_true',
+                       help='Show success rate, p50/p95 upload time and MB/s across past runs, then exit')
+    parser.add_argument('--days', type=float, default=None,
+                       help='With --stats: only include runs from the last N days')
+    # Pack many tiny captures into one upload each hour instead of one request per file
+    parser.add_argument('--bundle-small-files', nargs='?', type=int, const=BUNDLE_THRESHOLD_KB, default=None,
+                       metavar='KB',
+                       help=f'Upload files smaller than KB (default: {BUNDLE_THRESHOLD_KB}) as one uncompressed '
+                            f'ZIP per hour of capture time')
+    # Shutdown scripts get killed after a while - only start what fits in the time we have
+    parser.add_argument('--time-budget', type=float, default=None, metavar='SECONDS',
+                       help=f'Finish within this many seconds, leaving what does not fit for the next run '
+                            f'(default: {SHUTDOWN_TIME_BUDGET:g} in shutdown mode, unlimited otherwise)')
+    # Extra copies of every capture, read from disk once and streamed to all destinations
+    parser.add_argument('--mirror-drive', action='append', default=[], metavar='FOLDER_ID[,TOKEN_FILE]',
+                       help='Also upload to this Drive folder; add the token file of another account to '
+                            'mirror into that account (logs in once). Can be given several times')
+    parser.add_argument('--backup-dir', action='append', default=[], metavar='FOLDER',
+                       help='Also copy captures into this local folder. Can be given several times')
+    # Startup, shutdown and manual runs can overlap - only one uploads, the others hand it their files
+    parser.add_argument('--if-running', choices=['handoff', 'exit'], default='handoff',
+                       help='When another uploader run is active: hand it the new files found here and '
+                            'exit (handoff), or just exit (default: handoff)')
+    parser.add_argument('--priority', choices=PRIORITY_POLICIES, default=None,
+                       help='Upload order: oldest first, newest first, or smallest first to fit the most '
+                            'files (default: newest with a time budget, oldest otherwise)')
+    # Where to look for captures and which files count (both can be given several times)
+    parser.add_argument('--source', action='append', default=None, metavar='FOLDER',
+                       help='Folder to upload captures from; repeat for several folders. Captures '
+                            'from the 2nd folder on are named "<folder>__<file>" in Drive '
+                            '(default: the LOCAL_FOLDER set in the script)')
+    parser.add_argument('--pattern', action='append', default=None, metavar='GLOB',
+                       help=f'File pattern to pick up, e.g. "*.png"; repeat for several '
+                            f'(default: {" ".join(SCREENSHOT_PATTERNS)})')
+    parser.add_argument('--recursive', action='store_true',
+                       help='Also pick up captures in subfolders of the source folders '
+                            '(named "<subfolder>__<file>" in Drive)')
+    # Re-encode captures before uploading to send fewer bytes (needs Pillow; AVIF needs a Pillow with AVIF support)
+    parser.add_argument('--transcode', choices=sorted(TRANSCODE_FORMATS), default=None,
+                       help='Re-encode screenshots to this format before uploading (keeps the original '
+                            'when the result is not smaller)')
+    parser.add_argument('--quality', type=int, default=TRANSCODE_QUALITY,
+                       help=f'With --transcode: encoder quality 1-100 (default: {TRANSCODE_QUALITY})')
+    # Export per-phase timings and counters after the run (.prom = Prometheus textfile, else JSON)
+    parser.add_argument('--metrics-file', default=None,
+                       help='Write run metrics to this file (.prom for Prometheus textfile format, '
+                            'anything else for a JSON snapshot)')
+    # Wrap the whole run in cProfile to see where the time goes
+    parser.add_argument('--profile', nargs='?', const=PROFILE_PATH, default=None,
+                       help=f'Profile the run with cProfile (main thread) and save the stats '
+                            f'(default file: {os.path.basename(PROFILE_PATH)})')
+    # Put uploads in YYYY/MM subfolders (by capture date) instead of one flat folder
+    parser.add_argument('--partition-by-date', action='store_true',
+                       help='Upload into YYYY/MM subfolders of the Drive folder, by file modification date')
+    # Ignore the local index / saved Drive state and check everything again
+    parser.add_argument('--full-scan', action='store_true',
+                       help='Re-list the whole Google Drive folder and re-check all local files, '
+                            'not just new/changed ones')
     return parser.parse_args() # This actually reads the command line and returns the values
 
 # Configuration
 LOCAL_FOLDER = r"C:\Users\USUARIO\OneDrive\Documentos\My_Projects\Capturas de pantalla"
+SCREENSHOT_PATTERNS = ["*.jpg"]  # Default file patterns (--pattern adds e.g. *.png, *.webp)
+# Joins subfolder / extra --source folder names into Drive file names ("Game__clips__shot.jpg")
+DRIVE_NAME_SEPARATOR = "__"
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # Threads walking directories in parallel
+# MIME type sent to Drive per extension; anything else falls back to the mimetypes module
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png",
+              ".webp": "image/webp", ".avif": "image/avif", ".heic": "image/heic", ".gif": "image/gif",
+              ".zip": "application/zip"}
 DRIVE_FOLDER_ID = "1FbAfXLxmJbpcEtm0ctoDrjydNriRyECA"
 SCOPES = ['https://www.googleapis.com/auth/drive']
 LOG_FILE = "upload_log.json"
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 EXECUTION_LOG_PATH = os.path.join(SCRIPT_DIR, "execution_log.txt")
-DETAILED_LOG_PATH = os.path.join(SCRIPT_DIR, "detailed_execution_log.json")
+# One compact JSON object per run (JSON lines), rotated when it gets too big
+DETAILED_LOG_PATH = os.path.join(SCRIPT_DIR, "detailed_execution_log.jsonl")
+DETAILED_LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate to .1, .2, ... past this size
+DETAILED_LOG_BACKUPS = 5  # Rotated files kept (oldest is deleted)
+# Pretty-printed entries separated by "=" lines, written by older versions
+LEGACY_DETAILED_LOG_PATH = os.path.join(SCRIPT_DIR, "detailed_execution_log.json")
+PROFILE_PATH = os.path.join(SCRIPT_DIR, "uploader_profile.prof")  # Default --profile output
+DRIVE_PAGE_SIZE = 1000  # Maximum files().list() page size the Drive API accepts
+DRIVE_BATCH_SIZE = 100  # Maximum calls Drive accepts in one HTTP batch request
+HTTP_TIMEOUT_SECONDS = 60  # Socket timeout for Drive API connections
+# Drive API discovery document, cached on disk so clients are built without fetching/parsing it each run
+DISCOVERY_CACHE_FILE = os.path.join(os.path.dirname(LOG_FILE), "drive_v3_discovery.json")
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/drive/v3/rest"
+DISCOVERY_CACHE_MAX_AGE = 7 * 24 * 3600  # Refresh the cached document weekly
+UPLOAD_RATE_LIMIT = 3.0  # Uploads started per second - Drive's sustained write guidance
+UPLOAD_CHUNK_SIZE_MB = 8  # Resumable upload chunk size (Drive needs multiples of 256 KB)
+# Resumable session URIs and byte offsets, stored next to the upload log
+RESUME_STATE_FILE = os.path.join(os.path.dirname(LOG_FILE), "upload_resume_state.json")
+RESUME_SESSION_MAX_AGE = 7 * 24 * 3600  # Drive expires resumable sessions after a week
+MAX_UPLOAD_ATTEMPTS = 3  # Tries per file before it counts as failed
+# Small-file bundling (--bundle-small-files): captures under the threshold go up as one
+# uncompressed ZIP per hour of capture time instead of one request each
+BUNDLE_THRESHOLD_KB = 256  # Files smaller than this are bundled
+BUNDLE_MIN_FILES = 2  # An hour with fewer small files than this uploads them one by one
+BUNDLE_DIR = os.path.join(os.path.dirname(LOG_FILE), "bundles")  # Archives waiting to be uploaded
+# Bundle name -> Drive ID + member MD5s, so the diff knows which captures a bundle already holds
+BUNDLE_MANIFEST_FILE = os.path.join(os.path.dirname(LOG_FILE), "bundle_manifest.json")
+# Time-budgeted runs (--time-budget, default for --mode shutdown)
+SHUTDOWN_TIME_BUDGET = 60.0  # Seconds a shutdown run gets unless --time-budget says otherwise
+BUDGET_SAFETY_SECONDS = 3.0  # Kept free at the end of a budget for saving logs and state
+THROUGHPUT_SAMPLE_FILES = 200  # Recent successful uploads used to estimate how long an upload takes
+THROUGHPUT_SAMPLE_RUNS = 10  # Recent batches used to estimate how much uploads overlap
+DEFAULT_UPLOAD_MBPS = 1.0  # Estimate used while the detailed log has no history yet...
+DEFAULT_UPLOAD_OVERHEAD = 1.0  # ...plus this many seconds per file
+PRIORITY_POLICIES = ["oldest", "newest", "smallest"]  # Upload order choices for --priority
+# Files a time-budgeted run had to leave for later (picked up by the next run)
+DEFERRED_UPLOADS_FILE = os.path.join(os.path.dirname(LOG_FILE), "deferred_uploads.json")
+# Adaptive concurrency (--workers auto): uploads in flight grow while MB/s improves, halve on 429s
+ADAPTIVE_MAX_WORKERS = 8  # Ceiling for --workers auto
+ADAPTIVE_WINDOW_FILES = 4  # Completed uploads per throughput measurement (at least one per slot)...
+ADAPTIVE_WINDOW_SECONDS = 1.0  # ...and at least this long, so tiny files don't give noisy readings
+ADAPTIVE_MIN_GAIN = 0.05  # An extra upload slot must raise MB/s by 5% to be kept
+ADAPTIVE_HOLD_WINDOWS = 3  # Measurements to wait after backing off before probing upwards again
+ADAPTIVE_THROTTLE_COOLDOWN = 5.0  # Seconds after halving during which more 429s don't halve again
+# Append-only journal of uploads since the last upload_log.json snapshot (one JSON object per line)
+UPLOAD_JOURNAL_FILE = os.path.join(os.path.dirname(LOG_FILE), "upload_log.journal.jsonl")
+JOURNAL_FSYNC_EVERY = 20  # Force journal entries to disk after this many appends...
+JOURNAL_FSYNC_INTERVAL = 2.0  # ...or this many seconds, whichever comes first
+JOURNAL_COMPACT_EVERY = 500  # Fold the journal into upload_log.json after this many entries
+# (size, mtime, inode) of every local file already confirmed in Drive, from the last run
+LOCAL_INDEX_FILE = os.path.join(os.path.dirname(LOG_FILE), "local_index.json")
+# MD5 of local files keyed by path, reused while (size, mtime) stay the same
+HASH_CACHE_FILE = os.path.join(os.path.dirname(LOG_FILE), "hash_cache.json")
+HASH_BLOCK_SIZE = 1024 * 1024  # Bytes fed to MD5 per step while streaming a file
+# Optional re-encoding before upload (--transcode, needs Pillow); outputs cached by source MD5
+TRANSCODE_CACHE_DIR = os.path.join(os.path.dirname(LOG_FILE), "transcode_cache")
+TRANSCODE_MANIFEST_FILE = os.path.join(TRANSCODE_CACHE_DIR, "manifest.json")
+TRANSCODE_QUALITY = 80  # Encoder quality (0-100) for --transcode
+# --transcode choice -> (Pillow format name, file extension, MIME type)
+TRANSCODE_FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "avif": ("AVIF", ".avif", "image/avif"),
+}
+PLAN_HASH_WINDOW = 2000  # Files hashed per step while planning, so per-step buffers stay small
+PLAN_VERBOSE_LIMIT = 200  # Above this many files, print counts instead of one line per file
+# Drive Changes API start token + the drive_files it is valid for, so later runs fetch only changes
+DRIVE_STATE_FILE = os.path.join(os.path.dirname(LOG_FILE), "drive_state.json")
+DRIVE_FILE_FIELDS = "name, id, createdTime, size, md5Checksum"  # Per-file fields we keep in drive_files
+DRIVE_FOLDER_MIME = "application/vnd.google-apps.folder"
+# --partition-by-date: "YYYY" / "YYYY/MM" -> Drive folder ID, so subfolders are looked up once
+DRIVE_FOLDER_INDEX_FILE = os.path.join(os.path.dirname(LOG_FILE), "drive_folder_index.json")
+# Single-instance coordination: the active run holds an OS lock on RUN_LOCK_FILE and listens on a
+# localhost socket (address in RUN_INFO_FILE) for files that later invocations hand over
+RUN_LOCK_FILE = os.path.join(os.path.dirname(LOG_FILE), "uploader.lock")
+RUN_INFO_FILE = os.path.join(os.path.dirname(LOG_FILE), "uploader_run.json")
+COORDINATOR_TIMEOUT = 5.0  # Seconds to wait for the active run to answer a handoff
+COORDINATOR_STARTUP_GRACE = 2.0  # Lock is held but the run info isn't written yet - retry this long
+COORDINATOR_WAIT_SECONDS = 30.0  # How long to wait for a finishing run to release the lock
+# Extra destinations (--mirror-drive, --backup-dir): each file is read once and streamed to all of them
+FANOUT_BLOCK_SIZE = 1024 * 1024  # Bytes read from disk per step and shared by every destination
+FANOUT_BUFFER_MB = 32  # Read-ahead kept for slower destinations; past it they read the file on their own
+WATCH_SETTLE_SECONDS = 2.0  # A new file must stop changing this long before it's uploaded
+WATCH_TICK_SECONDS = 0.5  # How often watch mode checks pending files
+WATCH_POLL_INTERVAL = 5.0  # Folder rescan interval when no filesystem events are available
+WATCH_RESCAN_INTERVAL = 300.0  # Safety rescan for missed events when watchdog is running
+WATCH_FAILED_RETRY_SECONDS = 60.0  # Wait before retrying a file whose upload failed in watch mode
 
-class ScreenshotUploader:
+def parse_workers(value):
+    """argparse type for --workers: a positive number or "auto" (returned as None)"""
+    if value.lower() == 'auto':
+        return None
+    try:
+        return max(1, int(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or 'auto', got '{value}'")
+
+def is_screenshot_name(filename, patterns=SCREENSHOT_PATTERNS):
+    """Like glob(pattern) on Windows: case-insensitive, no hidden files"""
+    if filename.startswith('.'):
+        return False
+    filename = filename.lower()
+    return any(fnmatch.fnmatchcase(filename, pattern.lower()) for pattern in patterns)
+
+def mime_type_for(file_path):
+    """MIME type Drive should store a file with, from its extension"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in MIME_TYPES:
+        return MIME_TYPES[extension]
+    import mimetypes
+    return mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+# Google client libraries are imported on first use (see load_google_libraries),
+# so runs that find nothing new locally never pay for importing them
+Request = Credentials = InstalledAppFlow = None
+build = build_from_document = MediaFileUpload = MediaIoBaseUpload = HttpError = None
+httplib2 = AuthorizedHttp = None
+
+def load_google_libraries(stand_ins=None):
+    """
+    Import the Google API client libraries (only the first call does any work)
+
+    Args:
+        stand_ins (dict, optional): HttpError / MediaFileUpload / MediaIoBaseUpload
+                                    from a plugged-in backend, used if the
+                                    libraries aren't installed
+
+    Returns:
+        float: Seconds spent importing (0 if they were already loaded)
+    """
+    global Request, Credentials, InstalledAppFlow, build, build_from_document
+    global MediaFileUpload, MediaIoBaseUpload, HttpError, httplib2, AuthorizedHttp
+
+    if HttpError is not None:
+        return 0.0
+
+    import_start = time.perf_counter()
+    try:
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build, build_from_document
+        from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+        from googleapiclient.errors import HttpError
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+    except ImportError:
+        if not stand_ins:
+            raise
+        MediaFileUpload = stand_ins["MediaFileUpload"]
+        MediaIoBaseUpload = stand_ins["MediaIoBaseUpload"]
+        HttpError = stand_ins["HttpError"]
+    return time.perf_counter() - import_start
+
+def transcode_codec_available(transcode_format):
+    """True if Pillow is installed and can write `transcode_format` ("jpeg", "webp" or "avif")"""
+    try:
+        from PIL import features
+    except ImportError:
+        return False
+    if transcode_format == "avif":
+        try:
+            import pillow_avif  # noqa: F401 - plugin that adds AVIF to older Pillow versions
+            return True
+        except ImportError:
+            pass
+    feature = {"jpeg": "jpg", "webp": "webp", "avif": "avif"}[transcode_format]
+    try:
+        return bool(features.check(feature))
+    except ValueError:
+        return False  # Pillow too old to know the feature at all
+
+def transcode_image(source_path, output_path, transcode_format, quality):
+    """
+    Re-encode one image file (runs in a worker process)
+
+    Writes to a temp file and renames it, so an interrupted run never
+    leaves a half-written file in the cache.
+
+    Returns:
+        int: Size of the output in bytes
+    """
+    from PIL import Image
+    if transcode_format == "avif":
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            pass
+
+    pil_format = TRANSCODE_FORMATS[transcode_format][0]
+    temp_path = output_path + ".tmp"
+    with Image.open(source_path) as image:
+        options = {"quality": quality}
+        if image.info.get("exif"):
+            options["exif"] = image.info["exif"]  # Keep capture date/orientation
+        if pil_format == "JPEG":
+            options["optimize"] = True
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")  # JPEG has no alpha channel
+        image.save(temp_path, format=pil_format, **options)
+    os.replace(temp_path, output_path)
+    return os.path.getsize(output_path)
+
+def rotate_detailed_log():
+    """Shift detailed_execution_log.jsonl -> .1 -> .2 ... dropping the oldest"""
+    for index in range(DETAILED_LOG_BACKUPS, 0, -1):
+        source = DETAILED_LOG_PATH if index == 1 else f"{DETAILED_LOG_PATH}.{index - 1}"
+        if os.path.exists(source):
+            os.replace(source, f"{DETAILED_LOG_PATH}.{index}")
+
+def iter_detailed_log_entries():
+    """
+    Stream every run entry from the detailed logs, oldest first
+
+    Reads the legacy pretty-printed log, then the rotated JSONL files,
+    then the current one - one line (or one entry) at a time, so the
+    whole history is never loaded into memory. Unreadable entries are
+    skipped.
+
+    Yields:
+        dict: One run's log entry
+    """
+    if os.path.exists(LEGACY_DETAILED_LOG_PATH):
+        with open(LEGACY_DETAILED_LOG_PATH, 'r', encoding='utf-8') as f:
+            buffer = []
+            for line in f:
+                if line.strip() == "=" * 50:
+                    try:
+                        yield json.loads("".join(buffer))
+                    except ValueError:
+                        pass
+                    buffer = []
+                else:
+                    buffer.append(line)
+
+    paths = [f"{DETAILED_LOG_PATH}.{index}" for index in range(DETAILED_LOG_BACKUPS, 0, -1)]
+    paths.append(DETAILED_LOG_PATH)
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # Torn line from an interrupted write
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def show_run_stats(days=None):
+    """
+    Aggregate upload statistics across runs by streaming over the detailed log
+
+    Args:
+        days (float, optional): Only include runs from the last N days
+    """
+    cutoff = datetime.now().timestamp() - days * 86400 if days else None
+
+    runs = 0
+    files_attempted = 0
+    files_succeeded = 0
+    upload_times = []  # Seconds per successful upload (needed for percentiles)
+    uploaded_mb = 0.0
+    upload_seconds = 0.0
+    batch_mb = 0.0
+    batch_seconds = 0.0
+    first_run = last_run = None
+
+    for entry in iter_detailed_log_entries():
+        try:
+            timestamp = datetime.fromisoformat(entry["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if cutoff and timestamp.timestamp() < cutoff:
+            continue
+
+        runs += 1
+        first_run = first_run or timestamp
+        last_run = timestamp
+        run_mb = 0.0
+
+        for file_detail in entry.get("files", []):
+            files_attempted += 1
+            if not file_detail.get("success"):
+                continue
+            files_succeeded += 1
+            run_mb += file_detail.get("size_mb", 0)
+            if file_detail.get("upload_time_seconds") is not None:
+                upload_times.append(file_detail["upload_time_seconds"])
+                uploaded_mb += file_detail.get("size_mb", 0)
+                upload_seconds += file_detail["upload_time_seconds"]
+
+        # Wall-clock batch time exists for newer entries (parallel uploads overlap)
+        if entry.get("execution_summary", {}).get("batch_seconds"):
+            batch_mb += run_mb
+            batch_seconds += entry["execution_summary"]["batch_seconds"]
+
+    period = f"last {days:g} days" if days else "all time"
+    print(f"\nUpload statistics ({period})")
+    print("=" * 50)
+    if not runs:
+        print("No runs found in the detailed log")
+        return
+
+    upload_times.sort()
+    print(f"Runs: {runs} ({first_run:%Y-%m-%d} to {last_run:%Y-%m-%d})")
+    print(f"Files attempted: {files_attempted}")
+    print(f"Success rate: {files_succeeded / files_attempted * 100 if files_attempted else 100:.1f}%")
+    if upload_times:
+        print(f"Upload time p50: {percentile(upload_times, 0.50):.2f}s")
+        print(f"Upload time p95: {percentile(upload_times, 0.95):.2f}s")
+    if upload_seconds > 0:
+        print(f"Per-upload throughput: {uploaded_mb / upload_seconds:.2f} MB/s")
+    if batch_seconds > 0:
+        print(f"Batch throughput: {batch_mb / batch_seconds:.2f} MB/s")
+    print("=" * 50)
+
+def estimate_upload_model():
+    """
+    Estimate upload speed from recent runs in the detailed log
+
+    Fits seconds = overhead + size_mb / mb_per_second (least squares)
+    over the last THROUGHPUT_SAMPLE_FILES successful uploads, and
+    measures how much uploads overlapped (sum of upload times / batch
+    wall time) over the last THROUGHPUT_SAMPLE_RUNS batches.
+
+    Returns:
+        dict: overhead, mb_per_second, parallelism and samples (file count used)
+    """
+    samples = deque(maxlen=THROUGHPUT_SAMPLE_FILES)  # (size_mb, seconds)
+    batches = deque(maxlen=THROUGHPUT_SAMPLE_RUNS)  # (sum of upload seconds, batch seconds)
+    for entry in iter_detailed_log_entries():
+        upload_seconds = 0.0
+        for file_detail in entry.get("files", []):
+            if file_detail.get("success") and file_detail.get("upload_time_seconds") is not None:
+                samples.append((file_detail.get("size_mb", 0), file_detail["upload_time_seconds"]))
+                upload_seconds += file_detail["upload_time_seconds"]
+        batch_seconds = entry.get("execution_summary", {}).get("batch_seconds")
+        if batch_seconds and upload_seconds:
+            batches.append((upload_seconds, batch_seconds))
+
+    overhead, mb_per_second = DEFAULT_UPLOAD_OVERHEAD, DEFAULT_UPLOAD_MBPS
+    if samples:
+        count = len(samples)
+        mean_size = sum(size for size, _ in samples) / count
+        mean_time = sum(seconds for _, seconds in samples) / count
+        variance = sum((size - mean_size) ** 2 for size, _ in samples)
+        slope = (sum((size - mean_size) * (seconds - mean_time) for size, seconds in samples) / variance
+                 if variance > 0 else 0)
+        if slope > 0:
+            overhead = max(0.0, mean_time - slope * mean_size)
+            mb_per_second = 1 / slope
+        elif mean_size > 0 and mean_time > 0:
+            # All files about the same size - no way to separate overhead from transfer time
+            overhead, mb_per_second = 0.0, mean_size / mean_time
+        else:
+            overhead = mean_time
+
+    parallelism = 1.0
+    if batches:
+        parallelism = max(1.0, sum(total for total, _ in batches) / sum(wall for _, wall in batches))
+
+    return {"overhead": overhead, "mb_per_second": mb_per_second,
+            "parallelism": parallelism, "samples": len(samples)}
+
+class UploadDeferred(Exception):
+    """An upload was stopped between chunks because the run's time budget ran out"""
+
+def prometheus_label_value(value):
+    """Escape a label value for the Prometheus text format (backslash, double quote, newline)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class RunMetrics:
+    """
+    Lightweight instrumentation for one run
+
+    Records wall time per phase (authenticate, scan Drive, scan local,
+    diff, upload) plus counters and peak gauges (API calls, bytes sent,
+    retries, queue depth). Thread-safe so upload workers can report too.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.phases = {}  # phase name -> seconds, in the order they ran
+        self.counters = defaultdict(int)  # (name, labels) -> value
+        self.peaks = {}  # name -> highest value seen
+        self.success = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of work as a named phase: `with metrics.phase("upload"): ...`"""
+        phase_start = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.time() - phase_start
+
+    def count(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def peak(self, name, value):
+        with self.lock:
+            if value > self.peaks.get(name, float('-inf')):
+                self.peaks[name] = value
+
+    def snapshot(self):
+        """All metrics as a plain dict (what the JSON export writes)"""
+        with self.lock:
+            counters = {}
+            for (name, labels), value in self.counters.items():
+                key = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+                counters[key] = value
+            return {
+                "timestamp": datetime.fromtimestamp(self.started).isoformat(),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "success": self.success,
+                "phases_seconds": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "counters": counters,
+                "peaks": dict(self.peaks)
+            }
+
+    def prometheus_text(self):
+        """Metrics in Prometheus text exposition format (for node_exporter's textfile collector)"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP uploader_last_run_timestamp_seconds When the last run started",
+            "# TYPE uploader_last_run_timestamp_seconds gauge",
+            f"uploader_last_run_timestamp_seconds {self.started:.0f}",
+            "# HELP uploader_run_duration_seconds Wall time of the last run",
+            "# TYPE uploader_run_duration_seconds gauge",
+            f"uploader_run_duration_seconds {snapshot['duration_seconds']}",
+            "# HELP uploader_run_success 1 if the last run succeeded",
+            "# TYPE uploader_run_success gauge",
+            f"uploader_run_success {1 if snapshot['success'] else 0}",
+            "# HELP uploader_phase_seconds Wall time per phase of the last run",
+            "# TYPE uploader_phase_seconds gauge",
+        ]
+        for name, seconds in snapshot["phases_seconds"].items():
+            lines.append(f'uploader_phase_seconds{{phase="{name}"}} {seconds}')
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            peaks = sorted(self.peaks.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"uploader_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} gauge")  # Per-run values, reset every run
+                declared.add(metric)
+            label_text = ("{" + ",".join(f'{k}="{prometheus_label_value(v)}"' for k, v in labels) + "}"
+                          if labels else "")
+            lines.append(f"{metric}{label_text} {value}")
+        for name, value in peaks:
+            lines.append(f"# TYPE uploader_{name}_max gauge")
+            lines.append(f"uploader_{name}_max {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write metrics to `path` atomically - Prometheus format for .prom, JSON otherwise"""
+        if path.endswith(".prom"):
+            content = self.prometheus_text()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def print_summary(self):
+        snapshot = self.snapshot()
+        print(f"\n⏱️  Run took {snapshot['duration_seconds']:.2f}s")
+        for name, seconds in snapshot["phases_seconds"].items():
+            share = seconds / snapshot["duration_seconds"] * 100 if snapshot["duration_seconds"] else 0
+            print(f"  {name:16s} {seconds:8.2f}s ({share:4.1f}%)")
+        for key, value in sorted(snapshot["counters"].items()):
+            print(f"  {key}: {value:,}")
+        for name, value in sorted(snapshot["peaks"].items()):
+            print(f"  {name} (max): {value:,}")
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter shared by all upload workers
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Each upload takes one token, so short bursts go out immediately and
+    the long-run pace never exceeds `rate` - no fixed sleep between files.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available
+
+        Returns:
+            float: Seconds spent waiting for the token
+        """
+        if self.rate <= 0:
+            return 0.0  # Rate limiting disabled
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                wait = (1 - self.tokens) / self.rate
+
+            # Sleep outside the lock so other workers can check the bucket
+            time.sleep(wait)
+            waited += wait
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for how many uploads run at once
+
+    Additive increase: after each measurement window, if aggregate MB/s
+    improved by at least ADAPTIVE_MIN_GAIN over the previous level, one
+    more upload slot is opened. If an increase didn't pay off, the slot
+    is taken back and the level is held for a few windows before probing
+    again. Multiplicative decrease: a rate-limit error halves the limit
+    (once per cooldown, since uploads already in flight may hit it too).
+    Every change is kept in `history` with its reason for the run log.
+    Only used from the scheduling thread.
+    """
+    def __init__(self, maximum, initial=1):
+        self.maximum = max(1, maximum)
+        self.limit = min(max(1, initial), self.maximum)
+        self.started = time.monotonic()
+        self.baseline_mbps = None  # Throughput measured at the level before the last increase
+        self.pending_increase = False  # Last change was an increase still being judged
+        self.hold_windows = 0
+        self.cooldown_until = 0.0
+        self.peak_limit = self.limit
+        self.history = [{"seconds": 0.0, "limit": self.limit, "reason": "start"}]
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_files = 0
+
+    def change(self, new_limit, reason):
+        if new_limit == self.limit:
+            return
+        self.limit = new_limit
+        self.peak_limit = max(self.peak_limit, new_limit)
+        seconds = round(time.monotonic() - self.started, 2)
+        self.history.append({"seconds": seconds, "limit": new_limit, "reason": reason})
+        print(f"⚙️  Concurrency -> {new_limit} ({reason})")
+
+    def record_success(self, size_bytes):
+        """Feed one finished upload; re-evaluates the limit when a window is full"""
+        self.window_bytes += size_bytes
+        self.window_files += 1
+        elapsed = time.monotonic() - self.window_start
+        if self.window_files < max(ADAPTIVE_WINDOW_FILES, self.limit) or elapsed < ADAPTIVE_WINDOW_SECONDS:
+            return
+
+        mbps = self.window_bytes / (1024 * 1024) / elapsed
+        self.reset_window()
+
+        if self.hold_windows:
+            self.hold_windows -= 1
+            self.baseline_mbps = mbps
+            return
+
+        if self.pending_increase and mbps < self.baseline_mbps * (1 + ADAPTIVE_MIN_GAIN):
+            # The extra slot didn't buy throughput - give it back and settle for a while
+            self.pending_increase = False
+            self.hold_windows = ADAPTIVE_HOLD_WINDOWS
+            self.change(self.limit - 1, f"{mbps:.2f} MB/s is no better than {self.baseline_mbps:.2f} MB/s")
+            return
+
+        if self.pending_increase:
+            reason = f"{mbps:.2f} MB/s, up from {self.baseline_mbps:.2f} MB/s"
+        else:
+            reason = f"probing for more throughput at {mbps:.2f} MB/s"
+        self.baseline_mbps = mbps
+        self.pending_increase = self.limit < self.maximum
+        self.change(min(self.limit + 1, self.maximum), reason)
+
+    def record_throttle(self):
+        """Feed a rate-limit error: halve the limit unless we just did"""
+        now = time.monotonic()
+        if now < self.cooldown_until:
+            return
+        self.cooldown_until = now + ADAPTIVE_THROTTLE_COOLDOWN
+        self.pending_increase = False
+        self.hold_windows = ADAPTIVE_HOLD_WINDOWS
+        self.reset_window()
+        self.change(max(1, self.limit // 2), "rate limited by Drive")
+
+    def summary(self):
+        """What ends up in the detailed log for this run"""
+        return {"final": self.limit, "peak": self.peak_limit, "maximum": self.maximum,
+                "changes": self.history}
+
+class RetryScheduler:
+    """
+    Delayed queue of failed uploads waiting out their backoff
+
+    Instead of sleeping inline after a failure, the batch puts the file
+    here and keeps uploading healthy files; the file is handed back out
+    once its delay has passed. Only used from the scheduling thread.
+    """
     def __init__(self):
+        self.heap = []  # (ready_at, sequence, item) - sequence keeps equal times in FIFO order
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, item, delay):
+        """Queue `item` to become ready `delay` seconds from now"""
+        heapq.heappush(self.heap, (time.monotonic() + delay, next(self.sequence), item))
+
+    def pop_ready(self):
+        """Return the next item whose delay has passed, or None"""
+        if self.heap and self.heap[0][0] <= time.monotonic():
+            return heapq.heappop(self.heap)[2]
+        return None
+
+    def drain(self):
+        """Remove and return every queued item, whether due or not"""
+        items = [item for _, _, item in sorted(self.heap)]
+        self.heap = []
+        return items
+
+    def seconds_until_next(self):
+        """Seconds until the earliest queued item is ready (None if empty)"""
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - time.monotonic())
+
+class UploadJournal:
+    """
+    Append-only JSON-lines journal of upload log changes
+
+    Every upload adds one small {"key": ..., "value": ...} line instead of
+    rewriting the whole log. Lines are flushed immediately (survives the
+    process being killed) and fsynced in batches (survives power loss up
+    to the last batch). Callers are expected to hold their own lock.
+    """
+    def __init__(self, path, fsync_every=JOURNAL_FSYNC_EVERY, fsync_interval=JOURNAL_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.file = None
+        self.entries = 0  # Lines in the journal since the last compaction
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def replay(self, data):
+        """
+        Apply every journal entry on top of `data` (the snapshot dict)
+
+        A torn last line from a crash mid-write is skipped, as is any
+        line that isn't a {"key": ..., "value": ...} object.
+
+        Returns:
+            int: Number of entries applied
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        applied = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partial line left by an interrupted write
+                if not isinstance(entry, dict) or 'key' not in entry or 'value' not in entry:
+                    continue  # Valid JSON, but not a journal entry
+                try:
+                    data[entry['key']] = entry['value']
+                except TypeError:
+                    continue  # Unhashable key (e.g. a list)
+                applied += 1
+
+        self.entries = applied
+        return applied
+
+    def append(self, key, value):
+        """Add one entry to the journal"""
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+            # Start on a fresh line if a crash left a torn entry at the end
+            if self.file.tell() > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self.file.write("\n")
+
+        self.file.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.entries += 1
+        self.unsynced += 1
+
+        if (self.unsynced >= self.fsync_every
+                or time.monotonic() - self.last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """fsync pending entries to disk"""
+        if self.file is not None and self.unsynced:
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def reset(self):
+        """Empty the journal once its entries are safely in the snapshot"""
+        self.close()
+        open(self.path, 'w', encoding='utf-8').close()
+        self.entries = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+class RunCoordinator:
+    """
+    Keeps overlapping uploader runs from doing the same work twice
+
+    The first run takes an OS-level lock on RUN_LOCK_FILE (released by
+    the OS even if the process is killed) and serves a localhost socket.
+    Later invocations scan their folders, send the new paths over that
+    socket and exit; the active run uploads them after its own batch.
+
+    Every file the active run plans to upload or accepts from another
+    run is claimed with its (size, mtime), so the same bytes are never
+    queued twice. A changed file gets a new claim.
+    """
+    def __init__(self, lock_path=RUN_LOCK_FILE, info_path=RUN_INFO_FILE):
+        self.lock_path = lock_path
+        self.info_path = info_path
+        self.lock_file = None
+        self.server = None
+        self.token = None  # Shared secret in the run info file, so only local uploader runs can hand off
+        self.lock = threading.RLock()  # accept() claims while holding it
+        self.claims = {}  # path -> (size, mtime) of files this run has taken on
+        self.handoffs = []  # Claimed paths from other runs, not yet planned
+        self.closing = False  # Set once the last handoffs were taken - later ones are refused
+
+    def lock_os_file(self):
+        """Non-blocking exclusive lock on the open lock file; False if another process has it"""
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, mode):
+        """
+        Become the active run if no other uploader holds the lock
+
+        Returns:
+            bool: True if this process is now the active run
+        """
+        self.lock_file = open(self.lock_path, 'a+')
+        if not self.lock_os_file():
+            self.lock_file.close()
+            self.lock_file = None
+            return False
+
+        coordinator = self
+
+        class HandoffHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline())
+                    if request.get("token") != coordinator.token:
+                        return
+                    reply = coordinator.accept(request.get("files", []))
+                except (ValueError, OSError):
+                    return
+                self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+
+        try:
+            self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), HandoffHandler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            self.token = secrets.token_hex(16)
+            temp_path = self.info_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"pid": os.getpid(), "port": self.server.server_address[1], "token": self.token,
+                           "mode": mode, "started": datetime.now().isoformat(timespec='seconds')}, f)
+            os.replace(temp_path, self.info_path)
+        except OSError as e:
+            # Still the only run - we just can't take handoffs
+            print(f"Could not start the run coordinator: {e}")
+        return True
+
+    def release(self):
+        """Stop taking handoffs and let the next run in"""
+        with self.lock:
+            self.closing = True
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.lock_file:
+            try:
+                os.remove(self.info_path)
+            except OSError:
+                pass
+            if os.name == 'nt':
+                import msvcrt
+                try:
+                    self.lock_file.seek(0)
+                    msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                except OSError:
+                    pass
+            self.lock_file.close()
+            self.lock_file = None
+
+    def file_key(self, path):
+        """(size, mtime) a claim is made for, or None if the file is gone"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime)
+
+    def claim(self, paths):
+        """Claim `paths` for this run; returns the ones not already claimed in their current version"""
+        claimed = []
+        with self.lock:
+            for path in paths:
+                key = self.file_key(path)
+                if key is not None and self.claims.get(path) != key:
+                    self.claims[path] = key
+                    claimed.append(path)
+        return claimed
+
+    def accept(self, paths):
+        """Take files handed over by another run (called from the socket server thread)"""
+        with self.lock:
+            if self.closing:
+                return {"closing": True}
+            accepted = self.claim(paths)
+            self.handoffs.extend(accepted)
+        return {"accepted": len(accepted), "already_claimed": len(paths) - len(accepted)}
+
+    def take_handoffs(self, close=False):
+        """
+        Handed-over files waiting to be uploaded
+
+        With close=True no more are accepted afterwards, so nothing can be
+        handed over in the gap between the last check and release().
+        """
+        with self.lock:
+            handoffs, self.handoffs = self.handoffs, []
+            if close:
+                self.closing = True
+        return handoffs
+
+    def read_run_info(self):
+        """Address of the active run, waiting briefly if it is still starting up"""
+        give_up_at = time.monotonic() + COORDINATOR_STARTUP_GRACE
+        while True:
+            try:
+                with open(self.info_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                if time.monotonic() >= give_up_at:
+                    return None
+                time.sleep(0.1)
+
+    def hand_off(self, paths):
+        """
+        Send `paths` to the active run
+
+        Returns:
+            dict: Its reply ({"accepted", "already_claimed"} or {"closing": True}), or None if unreachable
+        """
+        info = self.read_run_info()
+        if not info:
+            return None
+        request = json.dumps({"token": info.get("token"), "files": paths}) + "\n"
+        try:
+            with socket.create_connection(("127.0.0.1", info["port"]), timeout=COORDINATOR_TIMEOUT) as conn:
+                conn.sendall(request.encode('utf-8'))
+                with conn.makefile('r', encoding='utf-8') as reply:
+                    return json.loads(reply.readline())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def wait_for_release(self, mode, timeout=COORDINATOR_WAIT_SECONDS):
+        """Try to become the active run until `timeout` seconds have passed (None = no limit)"""
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while give_up_at is None or time.monotonic() < give_up_at:
+            if self.acquire(mode):
+                return True
+            time.sleep(0.5)
+        return False
+
+class SharedFileReader:
+    """
+    Reads a file from disk once for several consumers (upload destinations)
+
+    Consumers pull byte ranges through their own SharedFileView. Blocks
+    are read on demand by whichever consumer is furthest ahead and kept
+    until every attached consumer has moved past them. If the kept
+    blocks would exceed `buffer_bytes`, the consumer furthest behind is
+    detached and reads the rest from its own file handle instead - so a
+    slow destination never holds the others back by more than the buffer.
+    """
+    def __init__(self, path, consumers, buffer_bytes=FANOUT_BUFFER_MB * 1024 * 1024,
+                 block_size=FANOUT_BLOCK_SIZE):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.block_size = block_size
+        self.buffer_bytes = max(buffer_bytes, block_size)
+        self.lock = threading.Lock()
+        self.file = open(path, 'rb')
+        self.blocks = {}  # Block number -> bytes, for blocks some attached consumer still needs
+        self.next_block = 0  # First block not read from disk yet
+        self.positions = {consumer: 0 for consumer in consumers}  # Attached consumer -> next byte it needs
+        self.detached = set()  # Consumers reading on their own (fell too far behind, or gave up)
+        self.bytes_read = 0  # Read from disk for the shared buffer
+        self.bytes_reread = 0  # Read again by detached consumers
+
+    def view(self, consumer):
+        """File-like object for one consumer"""
+        return SharedFileView(self, consumer)
+
+    def detach(self, consumer):
+        """Stop keeping blocks for `consumer` (it finished, failed, or is too slow)"""
+        with self.lock:
+            if self.positions.pop(consumer, None) is not None:
+                self.detached.add(consumer)
+            self.evict()
+
+    def evict(self):
+        """Drop blocks every attached consumer has moved past; caller holds the lock"""
+        needed_from = min(self.positions.values(), default=self.size) // self.block_size
+        for block in [block for block in self.blocks if block < needed_from]:
+            del self.blocks[block]
+
+    def read_direct(self, begin, length):
+        """Read a range with a private handle (for detached consumers and evicted blocks)"""
+        with open(self.path, 'rb') as f:
+            f.seek(begin)
+            data = f.read(length)
+        with self.lock:
+            self.bytes_reread += len(data)
+        return data
+
+    def read(self, consumer, begin, length):
+        """Bytes [begin, begin + length) for `consumer`"""
+        length = max(0, min(length, self.size - begin))
+        if not length:
+            return b""
+        with self.lock:
+            if consumer not in self.positions:
+                attached = False
+            else:
+                attached = True
+                first_block, last_block = begin // self.block_size, (begin + length - 1) // self.block_size
+                while self.next_block <= last_block:
+                    self.file.seek(self.next_block * self.block_size)
+                    block = self.file.read(self.block_size)
+                    self.blocks[self.next_block] = block
+                    self.next_block += 1
+                    self.bytes_read += len(block)
+                    # Over the buffer: cut loose whoever is furthest behind (never the reader itself)
+                    while len(self.blocks) * self.block_size > self.buffer_bytes:
+                        others = [other for other in self.positions if other != consumer]
+                        if not others:
+                            break
+                        slowest = min(others, key=lambda other: self.positions[other])
+                        del self.positions[slowest]
+                        self.detached.add(slowest)
+                        self.evict()
+                blocks = [self.blocks.get(block) for block in range(first_block, last_block + 1)]
+                if all(block is not None for block in blocks):
+                    self.positions[consumer] = begin + length
+                    self.evict()
+                    start = begin - first_block * self.block_size
+                    return b"".join(blocks)[start:start + length]
+        # Detached, or seeking back into blocks already dropped (e.g. a retried chunk)
+        if attached:
+            with self.lock:
+                self.positions[consumer] = max(self.positions.get(consumer, 0), begin + length)
+        return self.read_direct(begin, length)
+
+    def close(self):
+        self.file.close()
+        self.blocks.clear()
+
+class SharedFileView:
+    """Seekable read-only file object over a SharedFileReader, as MediaIoBaseUpload expects"""
+    def __init__(self, reader, consumer):
+        self.reader = reader
+        self.consumer = consumer
+        self.position = 0
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.reader.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.reader.size - self.position
+        data = self.reader.read(self.consumer, self.position, size)
+        self.position += len(data)
+        return data
+
+class LocalBackupSink:
+    """Extra destination: copy each capture into a local folder (--backup-dir)"""
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.name = f"backup:{os.path.normcase(self.directory)}"  # Key prefix in the upload log
+
+    def connect(self, uploader):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, stream, name, mimetype, mtime, previous_ref=None):
+        """
+        Write the stream to the backup folder (temp file + rename, so no half copies)
+
+        Returns:
+            str: Path of the backup copy
+        """
+        target = os.path.join(self.directory, name)
+        temp_path = target + ".tmp"
+        with open(temp_path, 'wb') as f:
+            while True:
+                block = stream.read(FANOUT_BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+        os.replace(temp_path, target)
+        os.utime(target, (mtime, mtime))
+        return target
+
+class DriveMirrorSink:
+    """
+    Extra destination: a second Drive folder, optionally in another account (--mirror-drive)
+
+    Args:
+        folder_id (str): Drive folder to upload into
+        token_file (str, optional): token.json of the other account (None = same account)
+    """
+    def __init__(self, folder_id, token_file=None):
+        self.folder_id = folder_id
+        self.token_file = token_file
+        self.name = f"drive:{folder_id}"  # Key prefix in the upload log
+        self.service_factory = None
+        self.chunk_size = UPLOAD_CHUNK_SIZE_MB * 1024 * 1024
+        self.thread_local = threading.local()  # One Drive client per upload thread
+
+    def connect(self, uploader):
+        """Set up Drive clients (logging in to the other account if needed)"""
+        self.chunk_size = uploader.chunk_size
+        if uploader.drive_backend is not None or not self.token_file:
+            self.service_factory = uploader.build_drive_service
+            return
+        transport = DriveTransport(uploader.load_mirror_credentials(self.token_file))
+        self.service_factory = lambda: uploader.build_drive_service(transport)
+
+    def send(self, stream, name, mimetype, mtime, previous_ref=None):
+        """
+        Resumable upload of the stream; replaces the earlier copy if there is one
+
+        Returns:
+            str: Drive file ID in the mirror folder
+        """
+        service = getattr(self.thread_local, 'service', None)
+        if service is None:
+            service = self.thread_local.service = self.service_factory()
+
+        def create_request(file_id):
+            media = MediaIoBaseUpload(stream, mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+            if file_id:
+                return service.files().update(fileId=file_id, media_body=media, fields='id')
+            return service.files().create(body={'name': name, 'parents': [self.folder_id]},
+                                          media_body=media, fields='id')
+
+        try:
+            request = create_request(previous_ref)
+            response = None
+            while response is None:
+                _, response = request.next_chunk()
+        except HttpError as error:
+            # The earlier copy was deleted from the mirror - upload a new one
+            if not previous_ref or getattr(error.resp, 'status', None) != 404:
+                raise
+            stream.seek(0)
+            request = create_request(None)
+            response = None
+            while response is None:
+                _, response = request.next_chunk()
+        return response.get('id')
+
+class DriveTransport:
+    """
+    Persistent, instrumented HTTP connections for Drive API clients
+
+    Every Drive client gets one keep-alive httplib2 connection that it
+    reuses for all its requests (TLS handshake once, not per upload).
+    Clients are per worker thread, so the set of clients acts as the
+    connection pool. Connection setup time and request counts are
+    recorded so we can see how often we pay for a new connection.
+    """
+    def __init__(self, creds, timeout=HTTP_TIMEOUT_SECONDS):
+        self.creds = creds
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "request_seconds": 0.0,
+                      "connections_opened": 0, "connect_seconds": 0.0, "connect_failures": 0}
+
+        transport = self
+
+        class TimedHTTPSConnection(httplib2.HTTPSConnectionWithTimeout):
+            def connect(self):
+                # Runs only when a new connection is needed (TCP + TLS setup)
+                # Failed attempts count too, or a run where every connect fails would look like 100% reuse
+                connect_start = time.perf_counter()
+                try:
+                    super().connect()
+                except Exception:
+                    with transport.lock:
+                        transport.stats["connect_failures"] += 1
+                    raise
+                finally:
+                    transport.record("connections_opened", "connect_seconds", time.perf_counter() - connect_start)
+
+        class KeepAliveHttp(httplib2.Http):
+            def request(self, uri, method="GET", body=None, headers=None,
+                        redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+                if connection_type is None and uri.startswith("https:"):
+                    connection_type = TimedHTTPSConnection
+                request_start = time.perf_counter()
+                try:
+                    return super().request(uri, method, body, headers, redirections, connection_type)
+                finally:
+                    transport.record("requests", "request_seconds", time.perf_counter() - request_start)
+
+        self.http_class = KeepAliveHttp
+
+    def record(self, count_key, seconds_key, seconds):
+        with self.lock:
+            self.stats[count_key] += 1
+            self.stats[seconds_key] += seconds
+
+    def new_http(self):
+        """Authorized keep-alive HTTP object for one Drive client"""
+        return AuthorizedHttp(self.creds, http=self.http_class(timeout=self.timeout))
+
+    def snapshot(self):
+        """Connection stats for the logs: reuse rate and average setup time"""
+        with self.lock:
+            stats = dict(self.stats)
+        opened = stats["connections_opened"]
+        return {
+            "requests": stats["requests"],
+            "connections_opened": opened,
+            "connect_failures": stats["connect_failures"],
+            "connection_reuse_rate": round(max(0.0, 1 - opened / stats["requests"]), 3) if stats["requests"] else None,
+            "avg_connect_ms": round(stats["connect_seconds"] / opened * 1000, 1) if opened else None,
+            "avg_request_ms": round(stats["request_seconds"] / stats["requests"] * 1000, 1) if stats["requests"] else None
+        }
+
+class ScreenshotUploader:
+    def __init__(self, load_state=True):
+        # load_state=False leaves the on-disk state alone until load_state() (the script
+        # calls it once it holds the run lock)
         print("Initializing uploader...")
         self.service = None
         self.drive_files = {}  # Will store files currently in Google Drive
         self.silent_mode = False # This is the robot's "personality setting"
+        self.drive_scan_stats = {}  # Pages, files and latency of the last Drive scan
+        self.drive_page_token = None  # Changes API token that drive_files is current as of
+        # Storage backend: a callable returning a Drive v3-shaped client (files()/changes()
+        # resources). None = real Google Drive; benchmarks plug in fake_drive.FakeDrive.client
+        self.drive_backend = None
+        self.last_batch_details = []  # file_details of the most recent upload batch
+        self.creds = None  # Kept so each upload worker can build its own Drive client
+        self.transport = None  # DriveTransport: keep-alive connections + connection stats
+        self.discovery_document = None  # Parsed Drive v3 discovery doc, shared by all clients
+        self.startup_timings = {}  # Import / discovery / auth seconds, reported separately
+        self.metrics = RunMetrics()  # Phase timings, API calls, bytes, retries, queue depth
+        self.metrics_file = None  # Where to export metrics after run() (set from --metrics-file)
+        self.workers = 1  # Concurrent upload threads (set from --workers); the ceiling when adaptive
+        self.adaptive_concurrency = False  # --workers auto: AdaptiveConcurrency picks the level
+        self.last_concurrency = None  # AdaptiveConcurrency.summary() of the last batch
+        self.transcode_format = None  # Key of TRANSCODE_FORMATS (set from --transcode), None = upload as-is
+        self.transcode_quality = TRANSCODE_QUALITY
+        self.transcode_manifest = None  # "md5:format:quality" -> cached output info (loaded lazily)
+        self.prepared_uploads = {}  # local path -> (path to upload, Drive name, MIME type) for transcoded files
+        self.rate_limit = UPLOAD_RATE_LIMIT  # Uploads started per second (set from --rate-limit)
+        self.log_lock = threading.Lock()  # Guards uploaded_files when workers run in parallel
+        self.journal = UploadJournal(UPLOAD_JOURNAL_FILE)  # One line per upload between snapshots
+        self.thread_local = threading.local()  # Holds one Drive client per worker thread
+        self.chunk_size = UPLOAD_CHUNK_SIZE_MB * 1024 * 1024  # Bytes per resumable chunk
+        self.resume_lock = threading.Lock()  # Guards resume_state across upload workers
+        self.resume_state = {}  # Interrupted uploads we can pick up again (see load_state)
+        self.max_attempts = MAX_UPLOAD_ATTEMPTS  # Tries per file in the batch retry scheduler
+        self.local_stats = {}  # path -> (size, mtime, inode) of new/changed files from this run's single scan
+        self.local_file_count = 0  # Screenshots seen by the last local folder scan
+        self.local_index = {}  # path -> [size, mtime, inode] known to be in Drive (see load_state)
+        self.local_index_dirty = False
+        self.full_scan = False  # True = ignore local_index (set from --full-scan)
+        self.partition_by_date = False  # Upload into YYYY/MM subfolders (set from --partition-by-date)
+        self.source_folders = None  # Folders to scan (set from --source); None = [LOCAL_FOLDER]
+        self.patterns = list(SCREENSHOT_PATTERNS)  # Filename globs that count as captures (--pattern)
+        self.recursive = False  # Walk subfolders of the source folders too (--recursive)
+        self.source_roots = None  # [(normalized folder, folder, name prefix)] for drive_name_for (built lazily)
+        self.drive_name_owners = {}  # Drive name -> local path using it (only with several folders)
+        self.drive_folders = None  # "YYYY" / "YYYY/MM" -> Drive folder ID (loaded lazily)
+        self.listed_partitions = set()  # "YYYY/MM" partitions whose files are in drive_files
+        self.upload_parents = {}  # local path -> Drive folder ID to upload it into
+        self.bundle_threshold = None  # Bytes; smaller files are bundled (set from --bundle-small-files)
+        self.bundle_manifest = None  # Bundle name -> {"id", "files": {member: md5}} (loaded lazily)
+        self.bundled_md5s = {}  # Capture MD5 -> bundle name, built from the manifest
+        self.bundle_members = {}  # Local bundle archive path -> capture paths inside it
+        self.time_budget = None  # Seconds run() may take (set from --time-budget)
+        self.priority = "oldest"  # Upload order, one of PRIORITY_POLICIES (set from --priority)
+        self.deadline = None  # time.monotonic() after which no upload may start or continue
+        self.last_deferred = []  # Files the last batch stopped or never started because of the deadline
+        self.coordinator = None  # RunCoordinator while this process is the active run (None = not coordinated)
+        self.destinations = []  # LocalBackupSink / DriveMirrorSink besides the main Drive folder
+        self.active_destinations = None  # Destinations connected this run (None = not connected yet)
+        self.primary_plan = set()  # Planned files the main Drive folder needs (with destinations)
+        self.mirror_plan = {}  # Planned file -> destinations that still need it
+        self.sink_pool = None  # Threads sending to extra destinations during a batch
+        self.hash_cache = None  # path -> [size, mtime, md5]; loaded only when something needs hashing
+        self.hash_cache_dirty = False
+        self.uploaded_files = {}
+        if load_state:
+            self.load_state()
+
+    def load_state(self):
+        """
+        (Re)load the upload log, resume sessions and local index from disk
+
+        The script only calls this once it holds the run lock: loading
+        can compact upload_log.json, and state read before another run
+        finished would be stale (see RunCoordinator).
+        """
+        self.journal.close()
+        self.journal = UploadJournal(UPLOAD_JOURNAL_FILE)
+        self.resume_state = self.load_resume_state()
+        self.local_index = self.load_local_index()
+        self.local_index_dirty = False
         try:
             self.uploaded_files = self.load_upload_log()
             print("Upload log loaded successfully")
         except Exception as e:
             print(f"Error loading log: {e}")
             self.uploaded_files = {}
+        # Lazily loaded state is re-read on next use
+        self.hash_cache = None
+        self.hash_cache_dirty = False
+        self.drive_page_token = None
+        self.drive_files = {}
+        self.drive_folders = None
+        self.listed_partitions = set()
+        self.bundle_manifest = None
+        self.transcode_manifest = None
     
     def load_upload_log(self):
-        """Load the log of previously uploaded files"""
+        """
+        Load the log of previously uploaded files
+
+        Reads the upload_log.json snapshot (the original format, so existing
+        logs keep working) and then replays the journal on top of it.
+        """
+        data = {}
         if os.path.exists(LOG_FILE):
             try:
                 with open(LOG_FILE, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     print(f"Loaded {len(data)} entries from log")
-                    return data
             except Exception as e:
                 print(f"Error reading log file: {e}")
-                return {}
+                data = {}
         else:
             print("No existing log file found")
-            return {}
+
+        try:
+            replayed = self.journal.replay(data)
+            if replayed:
+                print(f"Replayed {replayed} journal entries")
+        except Exception as e:
+            print(f"Error reading upload journal: {e}")
+
+        # Fold a long journal back into the snapshot so startup stays fast
+        if self.journal.entries >= JOURNAL_COMPACT_EVERY:
+            self.uploaded_files = data
+            self.save_upload_log()
+
+        return data
+
+    def record_upload(self, filename, file_mod_time):
+        """
+        Record a finished upload in memory and as one journal line
+
+        Extra destinations use "<destination>|<filename>" keys with
+        [mtime, size, Drive ID or backup path] values (see record_destination).
+        """
+        with self.log_lock:
+            self.uploaded_files[filename] = file_mod_time
+            try:
+                self.journal.append(filename, file_mod_time)
+            except Exception as e:
+                print(f"Error writing upload journal: {e}")
+            compact = self.journal.entries >= JOURNAL_COMPACT_EVERY
+
+        if compact:
+            self.save_upload_log()
     
     def save_upload_log(self):
-        """Save the log of uploaded files"""
+        """
+        Save the log of uploaded files
+
+        Compacts the journal: writes the full log to upload_log.json
+        atomically, then empties the journal. Only runs at the end of a
+        batch or when the journal gets long - not after every file.
+        """
+        try:
+            # Hold the lock so no worker changes the dict while we write it
+            with self.log_lock:
+                # Write to a temp file and swap it in, so a crash mid-write
+                # can never leave a truncated upload_log.json behind
+                temp_path = LOG_FILE + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.uploaded_files, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, LOG_FILE)
+
+                # Journal entries are all in the snapshot now (replaying them
+                # again after a crash right here would be harmless)
+                self.journal.reset()
+            print("Upload log saved")
+        except Exception as e:
+            print(f"Error saving log: {e}")
+
+    def load_local_index(self):
+        """
+        Load the directory-state index saved by the last run
+
+        Returns:
+            dict: file path -> [size, mtime, inode] of files already synced
+        """
+        if not os.path.exists(LOCAL_INDEX_FILE):
+            return {}
+        try:
+            with open(LOCAL_INDEX_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading local index: {e}")
+            return {}
+
+    def save_local_index(self):
+        """Save the directory-state index (only if something changed)"""
+        if not self.local_index_dirty:
+            return
+        try:
+            with self.log_lock:
+                temp_path = LOCAL_INDEX_FILE + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.local_index, f, ensure_ascii=False)
+                os.replace(temp_path, LOCAL_INDEX_FILE)
+                self.local_index_dirty = False
+        except Exception as e:
+            print(f"Error saving local index: {e}")
+
+    def mark_synced(self, file_path):
+        """Remember that this exact version of a local file is in Drive (and every extra destination)"""
+        if self.destinations and self.destinations_missing(file_path):
+            return  # Still owed to a mirror/backup - the next scan must see it again
+        with self.log_lock:
+            self.local_index[file_path] = list(self.get_file_stat(file_path))
+            self.local_index_dirty = True
+
+    def load_hash_cache(self):
+        """Load cached local MD5 hashes from the last run"""
+        if not os.path.exists(HASH_CACHE_FILE):
+            return {}
+        try:
+            with open(HASH_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading hash cache: {e}")
+            return {}
+
+    def save_hash_cache(self):
+        """Save cached local MD5 hashes (only if something changed)"""
+        if self.hash_cache is None or not self.hash_cache_dirty:
+            return
+        try:
+            # Forget hashes of files that are gone from the local folder
+            self.hash_cache = {path: entry for path, entry in self.hash_cache.items()
+                               if path in self.local_stats or path in self.local_index}
+            temp_path = HASH_CACHE_FILE + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.hash_cache, f, ensure_ascii=False)
+            os.replace(temp_path, HASH_CACHE_FILE)
+            self.hash_cache_dirty = False
+        except Exception as e:
+            print(f"Error saving hash cache: {e}")
+
+    def compute_md5(self, file_path, file_size):
+        """
+        MD5 of a file, streamed through a memory map
+
+        The file is never read into one big buffer: the mmap lets the OS
+        page it in while MD5 consumes it block by block.
+        """
+        md5 = hashlib.md5()
+        if file_size == 0:
+            return md5.hexdigest()  # mmap can't map an empty file
+
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for offset in range(0, len(view), HASH_BLOCK_SIZE):
+                    md5.update(view[offset:offset + HASH_BLOCK_SIZE])
+        return md5.hexdigest()
+
+    def get_file_md5(self, file_path):
+        """
+        MD5 of a local file, from the cache when its size and mtime are unchanged
+
+        Returns:
+            str or None: Hex digest, or None if the file couldn't be read
+        """
+        file_size, file_mod_time, _ = self.get_file_stat(file_path)
+        if self.hash_cache is None:
+            self.hash_cache = self.load_hash_cache()
+        cached = self.hash_cache.get(file_path)
+        if cached and cached[0] == file_size and cached[1] == file_mod_time:
+            return cached[2]
+
+        try:
+            file_md5 = self.compute_md5(file_path, file_size)
+        except OSError as e:
+            print(f"Could not hash '{os.path.basename(file_path)}': {e}")
+            return None
+
+        self.hash_cache[file_path] = [file_size, file_mod_time, file_md5]
+        self.hash_cache_dirty = True
+        return file_md5
+
+    def hash_local_files(self, file_list):
+        """
+        Get MD5 hashes for many files, hashing cache misses in parallel
+
+        hashlib releases the GIL on large buffers, so threads use all cores.
+
+        Returns:
+            dict: file path -> md5 hex digest (or None if unreadable)
+        """
+        if self.hash_cache is None:
+            self.hash_cache = self.load_hash_cache()
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="hash") as pool:
+            return dict(zip(file_list, pool.map(self.get_file_md5, file_list)))
+
+    def load_transcode_manifest(self):
+        """Load the index of cached --transcode outputs"""
+        if not os.path.exists(TRANSCODE_MANIFEST_FILE):
+            return {}
+        try:
+            with open(TRANSCODE_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading transcode manifest: {e}")
+            return {}
+
+    def save_transcode_manifest(self):
+        """Save the transcode manifest, dropping outputs of files no longer in the local folder"""
+        try:
+            # Sources are identified by MD5; the hash cache knows every local file's MD5
+            live_md5s = {entry[2] for entry in (self.hash_cache or {}).values()}
+            for key in list(self.transcode_manifest):
+                if key.split(":", 1)[0] not in live_md5s:
+                    output = self.transcode_manifest.pop(key).get("file")
+                    if output:
+                        try:
+                            os.remove(os.path.join(TRANSCODE_CACHE_DIR, output))
+                        except OSError:
+                            pass
+
+            temp_path = TRANSCODE_MANIFEST_FILE + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.transcode_manifest, f, ensure_ascii=False)
+            os.replace(temp_path, TRANSCODE_MANIFEST_FILE)
+        except Exception as e:
+            print(f"Error saving transcode manifest: {e}")
+
+    def drive_identity(self, file_path, local_md5):
+        """
+        Name a local file has in Drive and the MD5s that count as "this content" there
+
+        Without --transcode that is just the file's own name and MD5. With
+        it, a file already re-encoded in an earlier run is also recognized
+        by its output (e.g. 'x.webp' with the WebP's MD5).
+
+        Returns:
+            tuple: (drive_name, tuple of md5 hex digests)
+        """
+        filename = self.drive_name_for(file_path)
+        if not self.transcode_format or not local_md5:
+            return filename, (local_md5,)
+
+        if self.transcode_manifest is None:
+            self.transcode_manifest = self.load_transcode_manifest()
+        entry = self.transcode_manifest.get(f"{local_md5}:{self.transcode_format}:{self.transcode_quality}")
+        if not entry or entry.get("skip"):
+            return filename, (local_md5,)
+        return os.path.splitext(filename)[0] + TRANSCODE_FORMATS[self.transcode_format][1], (local_md5, entry["md5"])
+
+    def prepare_transcoded_uploads(self, file_list):
+        """
+        Re-encode files for --transcode in a process pool, reusing cached outputs
+
+        Outputs live in TRANSCODE_CACHE_DIR named after the source MD5,
+        format and quality, so the same capture is never encoded twice.
+        When the re-encoded file is not smaller, the original is uploaded
+        instead (and that decision is cached too). Fills prepared_uploads.
+        """
+        self.prepared_uploads = {}
+        if not self.transcode_format or not file_list:
+            return
+
+        if not transcode_codec_available(self.transcode_format):
+            print(f"⚠️  Can't transcode to {self.transcode_format} (Pillow or its codec is not installed) - "
+                  f"uploading original files")
+            return
+
+        if self.transcode_manifest is None:
+            self.transcode_manifest = self.load_transcode_manifest()
+        os.makedirs(TRANSCODE_CACHE_DIR, exist_ok=True)
+        _, extension, mimetype = TRANSCODE_FORMATS[self.transcode_format]
+
+        transcode_start = time.time()
+        keys = {}  # local path -> manifest key
+        jobs = {}  # manifest key -> (source path, output path), one per distinct content
+        for file_path in file_list:
+            local_md5 = self.get_file_md5(file_path)
+            if local_md5 is None:
+                continue  # Unreadable - the upload will report it
+            key = f"{local_md5}:{self.transcode_format}:{self.transcode_quality}"
+            keys[file_path] = key
+            entry = self.transcode_manifest.get(key)
+            cached = entry and (entry.get("skip") or
+                                os.path.exists(os.path.join(TRANSCODE_CACHE_DIR, entry["file"])))
+            if not cached and key not in jobs:
+                output_name = f"{local_md5}_q{self.transcode_quality}{extension}"
+                jobs[key] = (file_path, os.path.join(TRANSCODE_CACHE_DIR, output_name))
+
+        if jobs:
+            print(f"Transcoding {len(jobs)} file(s) to {self.transcode_format} (quality {self.transcode_quality})...")
+            with ProcessPoolExecutor(max_workers=os.cpu_count() or 4) as pool:
+                futures = {pool.submit(transcode_image, source, output, self.transcode_format,
+                                       self.transcode_quality): key
+                           for key, (source, output) in jobs.items()}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    source, output = jobs[key]
+                    source_size = self.get_file_stat(source)[0]
+                    try:
+                        output_size = future.result()
+                    except Exception as e:
+                        # Not an image Pillow can read - remember that and upload the original
+                        print(f"Could not transcode '{os.path.basename(source)}': {e}")
+                        self.transcode_manifest[key] = {"skip": True, "reason": str(e)}
+                        continue
+                    if output_size >= source_size:
+                        os.remove(output)
+                        self.transcode_manifest[key] = {"skip": True, "reason": "not smaller"}
+                        continue
+                    self.transcode_manifest[key] = {
+                        "file": os.path.basename(output),
+                        "md5": self.compute_md5(output, output_size),
+                        "size": output_size
+                    }
+            self.save_transcode_manifest()
+
+        saved_bytes = 0
+        for file_path, key in keys.items():
+            entry = self.transcode_manifest.get(key)
+            if not entry or entry.get("skip"):
+                continue
+            drive_name = os.path.splitext(self.drive_name_for(file_path))[0] + extension
+            self.prepared_uploads[file_path] = (os.path.join(TRANSCODE_CACHE_DIR, entry["file"]),
+                                                drive_name, mimetype)
+            saved_bytes += self.get_file_stat(file_path)[0] - entry["size"]
+
+        self.metrics.count("transcoded_files", len(self.prepared_uploads))
+        self.metrics.count("transcode_bytes_saved", saved_bytes)
+        print(f"Transcode stage: {len(self.prepared_uploads)}/{len(file_list)} file(s) re-encoded, "
+              f"{len(jobs)} newly encoded, {saved_bytes / (1024 * 1024):.2f} MB saved "
+              f"({time.time() - transcode_start:.2f}s)")
+
+    def load_bundle_manifest(self):
+        """Bundles uploaded by earlier runs and the captures (by MD5) inside each"""
+        if self.bundle_manifest is not None:
+            return self.bundle_manifest
+        self.bundle_manifest = {}
+        if os.path.exists(BUNDLE_MANIFEST_FILE):
+            try:
+                with open(BUNDLE_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                    self.bundle_manifest = json.load(f)
+            except Exception as e:
+                print(f"Error reading bundle manifest: {e}")
+        # Reverse lookup for the diff: capture MD5 -> bundle holding it
+        self.bundled_md5s = {md5: name for name, bundle in self.bundle_manifest.items()
+                             for md5 in bundle["files"].values()}
+        return self.bundle_manifest
+
+    def save_bundle_manifest(self):
+        try:
+            with self.log_lock:
+                temp_path = BUNDLE_MANIFEST_FILE + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.bundle_manifest, f, ensure_ascii=False)
+                os.replace(temp_path, BUNDLE_MANIFEST_FILE)
+        except Exception as e:
+            print(f"Error saving bundle manifest: {e}")
+
+    def bundle_holding(self, local_md5):
+        """Name of an uploaded bundle (still in Drive) that contains these bytes, or None"""
+        if not local_md5:
+            return None
+        self.load_bundle_manifest()
+        name = self.bundled_md5s.get(local_md5)
+        return name if name in self.drive_files else None
+
+    def build_bundle(self, bundle_path, members):
+        """
+        Write an uncompressed ZIP of `members`, streaming each file in
+
+        ZIP_STORED skips compression (JPEG/PNG don't shrink anyway) and
+        zipfile copies files in blocks, so no capture is read whole into
+        memory. Written to a temp name and renamed when complete.
+        """
+        temp_path = bundle_path + ".tmp"
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for file_path in members:
+                archive.write(file_path, arcname=self.drive_name_for(file_path))
+        os.replace(temp_path, bundle_path)
+        # Give the archive the newest capture's time, so date partitions and ordering still work
+        newest = max(self.get_file_stat(file_path)[1] for file_path in members)
+        os.utime(bundle_path, (newest, newest))
+
+    def prepare_bundles(self, file_list):
+        """
+        Replace small files in an upload list with one ZIP per hour of capture time
+
+        Bundle names carry a hash of their members, so the same set of
+        files always produces the same archive - an interrupted bundle
+        upload is rebuilt identically (or reused from BUNDLE_DIR) and
+        resumes where it stopped.
+
+        Returns:
+            list: Upload list with bundled files replaced by their archive paths
+        """
+        self.bundle_members = {}
+        if not self.bundle_threshold or not file_list:
+            return file_list
+
+        hours = defaultdict(list)  # "YYYY-MM-DD_HH" -> small files captured in that hour
+        for file_path in file_list:
+            if self.active_destinations and file_path not in self.primary_plan:
+                continue  # Only wanted by a mirror/backup - those get the file itself
+            file_size, file_mod_time, _ = self.get_file_stat(file_path)
+            if file_size < self.bundle_threshold:
+                hours[datetime.fromtimestamp(file_mod_time).strftime("%Y-%m-%d_%H")].append(file_path)
+
+        bundle_start = time.time()
+        os.makedirs(BUNDLE_DIR, exist_ok=True)
+        bundled = set()
+        for hour, members in sorted(hours.items()):
+            # Two captures with the same name can't share an archive - leave the extras as single uploads
+            by_name = {}
+            for file_path in members:
+                by_name.setdefault(self.drive_name_for(file_path), file_path)
+            members = sorted(by_name.values(), key=self.drive_name_for)
+            if len(members) < BUNDLE_MIN_FILES:
+                continue
+
+            content_id = hashlib.md5()
+            for file_path in members:
+                content_id.update(f"{self.drive_name_for(file_path)}:{self.get_file_md5(file_path)}\n".encode('utf-8'))
+            bundle_path = os.path.join(BUNDLE_DIR, f"screenshots_{hour}_{content_id.hexdigest()[:8]}.zip")
+            if not os.path.exists(bundle_path):
+                try:
+                    self.build_bundle(bundle_path, members)
+                except OSError as e:
+                    print(f"Could not build bundle for {hour}: {e} - uploading those files one by one")
+                    continue
+            self.bundle_members[bundle_path] = members
+            bundled.update(members)
+            if self.active_destinations:
+                # The archive goes wherever any of its members still has to go
+                self.primary_plan.add(bundle_path)
+                pending = [sink for sink in self.active_destinations
+                           if any(sink in self.mirror_plan.get(file_path, ()) for file_path in members)]
+                if pending:
+                    self.mirror_plan[bundle_path] = pending
+
+        if not self.bundle_members:
+            return file_list
+
+        print(f"📦 Bundled {len(bundled)} small file(s) into {len(self.bundle_members)} archive(s) "
+              f"({time.time() - bundle_start:.2f}s)")
+        upload_list = [file_path for file_path in file_list if file_path not in bundled]
+        return upload_list + list(self.bundle_members)
+
+    def get_file_stat(self, file_path):
+        """
+        Get (size, mtime, inode) for a local file
+
+        Uses the result cached by scan_local_changes, so each new or
+        changed file is stat'ed once per run instead of once per step.
+        """
+        stat = self.local_stats.get(file_path)
+        if stat is None:
+            st = os.stat(file_path)
+            stat = (st.st_size, st.st_mtime, st.st_ino)
+            self.local_stats[file_path] = stat
+        return stat
+
+    def load_resume_state(self):
+        """
+        Load saved resumable upload sessions from a previous (interrupted) run
+
+        Returns:
+            dict: file path -> {uri, offset, size, mtime, updated}
+        """
+        if not os.path.exists(RESUME_STATE_FILE):
+            return {}
+
+        try:
+            with open(RESUME_STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"Error reading resume state: {e}")
+            return {}
+
+        # Drop sessions Drive has already expired - they can't be resumed anyway
+        now = time.time()
+        state = {path: entry for path, entry in state.items()
+                 if now - entry.get('updated', 0) < RESUME_SESSION_MAX_AGE}
+
+        if state:
+            print(f"Found {len(state)} interrupted upload(s) that can be resumed")
+        return state
+
+    def save_resume_state(self):
+        """Save resumable upload sessions so a killed run can resume next time"""
         try:
-            with open(LOG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.uploaded_files, f, indent=2, ensure_ascii=False)
-            print("Upload log saved")
+            with self.resume_lock:
+                # Write to a temp file first, then swap it in - a crash mid-write
+                # leaves the previous state file intact instead of a truncated one
+                temp_path = RESUME_STATE_FILE + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.resume_state, f, indent=2, ensure_ascii=False)
+                os.replace(temp_path, RESUME_STATE_FILE)
         except Exception as e:
-            print(f"Error saving log: {e}")
+            print(f"Error saving resume state: {e}")
 
-    def create_detailed_log_entry(self, mode, file_details, success_count, failed_count):
+    def update_resume_entry(self, file_path, entry):
+        """Record (entry=dict) or clear (entry=None) the resumable session for a file"""
+        with self.resume_lock:
+            if entry is None:
+                if self.resume_state.pop(file_path, None) is None:
+                    return  # Nothing saved for this file - no need to rewrite the state file
+            else:
+                self.resume_state[file_path] = entry
+        self.save_resume_state()
+
+    def create_detailed_log_entry(self, mode, file_details, success_count, failed_count, batch_seconds=None,
+                                  concurrency=None):
         """
         Create detailed JSON log entry for data analysis
         This creates machine-readable logs that you can analyze later
+
+        Each run is one compact JSON line, so the log can be read one
+        entry at a time (see iter_detailed_log_entries / --stats).
         """
-        import json
-        
         log_data = {
             "timestamp": datetime.now().isoformat(),
             "mode": mode,
@@ -86,9 +1944,21 @@ class ScreenshotUploader:
                 "total_files": len(file_details),
                 "successful_uploads": success_count,
                 "failed_uploads": failed_count,
-                "success_rate": (success_count / len(file_details) * 100) if file_details else 100
+                "deferred_uploads": sum(1 for detail in file_details if detail.get("deferred")),
+                # Deferred files were never given up on, so they don't count against the rate
+                "success_rate": (success_count / (success_count + failed_count) * 100
+                                 if success_count + failed_count else 100),
+                "batch_seconds": round(batch_seconds, 2) if batch_seconds is not None else None,
+                # Bytes --transcode kept off the wire for the files uploaded in this batch
+                "bytes_saved": sum(detail.get("transcode", {}).get("bytes_saved", 0)
+                                   for detail in file_details if detail.get("success"))
             },
+            # Upload slots used and why they changed (fixed runs just record the worker count)
+            "concurrency": concurrency,
             "files": file_details,
+            # Connection reuse and setup time of the Drive HTTP connections
+            "transport": self.transport.snapshot() if self.transport else None,
+            "startup_timings": self.startup_timings,
             "system_info": {
                 "python_version": sys.version.split()[0],
                 "os": os.name
@@ -96,15 +1966,20 @@ class ScreenshotUploader:
         }
         
         try:
+            line = json.dumps(log_data, separators=(',', ':'), ensure_ascii=False) + "\n"
+            # Keep the log size-capped: start a new file when this one is full
+            if (os.path.exists(DETAILED_LOG_PATH) and
+                    os.path.getsize(DETAILED_LOG_PATH) + len(line) > DETAILED_LOG_MAX_BYTES):
+                rotate_detailed_log()
             with open(DETAILED_LOG_PATH, "a", encoding='utf-8') as f:
-                f.write(json.dumps(log_data, indent=2) + "\n" + "="*50 + "\n")
+                f.write(line)
             print("Detailed log entry created")
             print(f"📍 Detailed log location: {DETAILED_LOG_PATH}")
         except Exception as e:
             print(f"Could not write detailed log: {e}")
             print(f"🔍 Attempted path: {DETAILED_LOG_PATH}")
 
-    def upload_with_retry(self, file_path, max_retries=3):
+    def upload_with_retry(self, file_path, max_retries=3, file_detail=None):
         """
         Upload with intelligent retry logic
         
@@ -113,23 +1988,27 @@ class ScreenshotUploader:
         - Jitter: Add randomness to avoid thundering herd problems
         - Different handling for different error types
         
+        This version blocks while it waits; the batch upload uses the
+        non-blocking RetryScheduler with the same retry decisions.
+        
         Args:
             file_path (str): Path to file to upload
             max_retries (int): Maximum number of retry attempts
+            file_detail (dict, optional): Detailed log record to fill with
+                                          attempt count and backoff time
         
         Returns:
             bool: True if upload succeeded, False otherwise
         """
-        import time
-        import random # For jitter
-
         filename = os.path.basename(file_path)
         
         for attempt in range(max_retries):
             try:
                 print(f"Upload attempt {attempt + 1}/{max_retries} for '{filename}'...")
+                if file_detail is not None:
+                    file_detail["upload_attempts"] = attempt + 1
                 
-                if self.upload_to_drive(file_path):
+                if self.upload_to_drive(file_path, file_detail=file_detail):
                     if attempt > 0:
                         print(f"Success on retry {attempt + 1} for '{filename}'")
                     return True
@@ -148,7 +2027,7 @@ class ScreenshotUploader:
                     return False
                 
                 # Use our error classification
-                should_retry, error_category = self.classify_error(e)
+                should_retry, error_category, delay = self.plan_retry(e, attempt + 1)
                 
                 if not should_retry:
                     print(f"🚫 {error_category} error - not retrying")
@@ -156,17 +2035,65 @@ class ScreenshotUploader:
 
                 # If this isn't the last attempt, wait before retrying
                 if attempt < max_retries - 1:
-                    # Exponential backoff with jitter
-                    base_delay = 2 ** attempt  # 1, 2, 4, 8 seconds
-                    jitter = random.uniform(0.1, 0.5)  # Add 0.1-0.5 seconds randomness
-                    delay = base_delay + jitter
-                    
                     print(f"Waiting {delay:.1f} seconds before retry...")
+                    if file_detail is not None:
+                        file_detail["backoff_seconds"] = round(file_detail.get("backoff_seconds", 0) + delay, 2)
                     time.sleep(delay)
         
         print(f"All {max_retries} attempts failed for '{filename}'")
         return False
 
+    def plan_retry(self, error, attempts_made):
+        """
+        Decide whether and when to retry a failed upload
+
+        Exponential backoff with jitter, stretched to whatever Drive asked
+        for in a Retry-After header (429 / rate limit responses).
+
+        Args:
+            error (Exception): The error from the failed attempt
+            attempts_made (int): Attempts so far, including the failed one
+
+        Returns:
+            tuple: (should_retry: bool, error_category: str, delay_seconds: float)
+        """
+        should_retry, error_category = self.classify_error(error)
+        if not should_retry:
+            return False, error_category, 0.0
+
+        base_delay = 2 ** (attempts_made - 1)  # 1, 2, 4, 8 seconds
+        jitter = random.uniform(0.1, 0.5)  # Add 0.1-0.5 seconds randomness
+        delay = base_delay + jitter
+
+        retry_after = self.get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return True, error_category, delay
+
+    def get_retry_after(self, error):
+        """
+        Read the Retry-After header from an HttpError, if Drive sent one
+
+        Returns:
+            float or None: Seconds Drive asked us to wait
+        """
+        resp = getattr(error, 'resp', None)
+        value = resp.get('retry-after') if hasattr(resp, 'get') else None
+        if not value:
+            return None
+
+        # Retry-After is either a number of seconds or an HTTP date
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
     def classify_error(self, error):
         """
         Classify errors to determine retry strategy
@@ -175,12 +2102,23 @@ class ScreenshotUploader:
             tuple: (should_retry: bool, error_category: str)
         """
         error_str = str(error).lower()
+
+        # HttpError carries the status code - more reliable than the message text
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        if status is not None:
+            status = int(status)
+            if status == 429:
+                return True, "rate_limit"
+            if status == 403 and 'ratelimitexceeded' in error_str.replace(' ', ''):
+                return True, "rate_limit"
+            if status in (500, 502, 503, 504):
+                return True, "server"
         
         # Never retry these errors
         if any(keyword in error_str for keyword in ['authentication', 'credentials', 'permission']):
             return False, "authentication"
         
-        if any(keyword in error_str for keyword in ['file not found', 'path not found']):
+        if isinstance(error, FileNotFoundError) or any(keyword in error_str for keyword in ['file not found', 'path not found']):
             return False, "file_system"
         
         if any(keyword in error_str for keyword in ['quota exceeded', 'storage full']):
@@ -234,6 +2172,22 @@ class ScreenshotUploader:
         """Authenticate with Google Drive API"""
         print("\nStarting authentication...")
         creds = None
+
+        # A plugged-in backend (e.g. the benchmark's fake Drive) needs no OAuth, and may
+        # bring stand-ins for the Google classes uploads use (its google_stand_ins)
+        backend_service = self.build_drive_service() if self.drive_backend is not None else None
+
+        # Only now that Drive is actually needed do we load the Google libraries
+        import_seconds = load_google_libraries(getattr(backend_service, 'google_stand_ins', None))
+        if import_seconds:
+            self.startup_timings["import_seconds"] = round(import_seconds, 3)
+            print(f"Loaded Google client libraries in {import_seconds:.2f}s")
+        auth_start = time.time()
+
+        if backend_service is not None:
+            self.service = backend_service
+            print("Using custom storage backend")
+            return True
         
         # The file token.json stores the user's access and refresh tokens.
         if os.path.exists('token.json'):
@@ -281,91 +2235,938 @@ class ScreenshotUploader:
                 print(f"Error saving token.json: {e}")
         
         try:
-            self.service = build('drive', 'v3', credentials=creds)
-            print("Successfully authenticated with Google Drive")
+            self.creds = creds
+            self.transport = DriveTransport(creds)
+            self.service = self.build_drive_service()
+            auth_seconds = time.time() - auth_start
+            self.startup_timings["auth_seconds"] = round(auth_seconds, 3)
+            print(f"Successfully authenticated with Google Drive ({auth_seconds:.2f}s)")
             return True
         except Exception as e:
             print(f"Error building Drive service: {e}")
             return False
     
-    def scan_google_drive_folder(self):
-        """Scan the Google Drive folder to see what files already exist"""
-        print("\nScanning Google Drive folder for existing files...")
-        
-        try:
-            # Query for all files in the specific Drive folder
-            query = f"'{DRIVE_FOLDER_ID}' in parents and trashed=false"
+    def build_drive_service(self, transport=None):
+        """Build a new Drive API client from the authenticated credentials (or another account's transport)"""
+        if self.drive_backend is not None:
+            return self.drive_backend()
+        # Each client owns one keep-alive connection from the transport
+        transport = transport or self.transport
+        document = self.load_discovery_document()
+        if document is None:
+            return build('drive', 'v3', http=transport.new_http())
+        return build_from_document(document, http=transport.new_http())
+
+    def load_mirror_credentials(self, token_file):
+        """Credentials for a --mirror-drive account from its own token file (logs in once if it's missing)"""
+        creds = None
+        if os.path.exists(token_file):
+            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        if not creds or not creds.valid:
+            print(f"Log in with the Google account to mirror into (saved to {token_file})...")
+            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+            creds = flow.run_local_server(port=0)
+        with open(token_file, 'w') as token:
+            token.write(creds.to_json())
+        return creds
+
+    def load_discovery_document(self):
+        """
+        Get the Drive v3 discovery document, parsed once and cached on disk
+
+        Order: already parsed this run -> fresh disk cache -> download
+        (and cache it). Returns None if none of those work, in which case
+        the caller falls back to build().
+        """
+        if self.discovery_document is not None:
+            return self.discovery_document
+
+        discovery_start = time.time()
+        document = None
+        cache_is_fresh = (os.path.exists(DISCOVERY_CACHE_FILE) and
+                          time.time() - os.path.getmtime(DISCOVERY_CACHE_FILE) < DISCOVERY_CACHE_MAX_AGE)
+
+        if cache_is_fresh:
+            try:
+                with open(DISCOVERY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                    document = json.load(f)
+            except Exception as e:
+                print(f"Error reading cached discovery document: {e}")
+
+        if document is None:
+            try:
+                response, content = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS).request(DISCOVERY_URL)
+                if response.status != 200:
+                    raise Exception(f"HTTP {response.status}")
+                document = json.loads(content)
+                temp_path = DISCOVERY_CACHE_FILE + ".tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_path, DISCOVERY_CACHE_FILE)
+                print("Drive discovery document downloaded and cached")
+            except Exception as e:
+                print(f"Could not download discovery document: {e}")
+                # An outdated copy still beats failing the run
+                try:
+                    with open(DISCOVERY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        document = json.load(f)
+                except Exception:
+                    return None
+
+        self.discovery_document = document
+        self.startup_timings["discovery_seconds"] = round(time.time() - discovery_start, 3)
+        return document
+
+    def get_worker_service(self):
+        """
+        Get the Drive client for the current worker thread
+
+        The googleapiclient service object (and the HTTP connection under it)
+        is not thread-safe, so every upload worker builds and reuses its own.
+        """
+        service = getattr(self.thread_local, 'service', None)
+        if service is None:
+            service = self.build_drive_service()
+            self.thread_local.service = service
+        return service
+
+    def execute_batch(self, requests, service=None):
+        """
+        Run metadata-only Drive calls as HTTP batch requests
+
+        Up to DRIVE_BATCH_SIZE calls travel in one round trip instead of
+        one each. Batches can't carry file content, so uploads never go
+        through here - use it for things like creating folders or
+        updating file metadata.
+
+        Args:
+            requests (list): Unexecuted requests, e.g. service.files().update(...)
+            service: Drive client to batch on (None = self.service)
+
+        Returns:
+            list: (response, error) for each request, in the same order
+        """
+        service = service or self.service
+        results = [None] * len(requests)
+
+        def store_result(index):
+            def callback(request_id, response, exception):
+                results[index] = (response, exception)
+            return callback
+
+        for start in range(0, len(requests), DRIVE_BATCH_SIZE):
+            batch = service.new_batch_http_request()
+            for index in range(start, min(start + DRIVE_BATCH_SIZE, len(requests))):
+                batch.add(requests[index], callback=store_result(index))
+            batch.execute()
+            self.metrics.count("api_calls", call="batch")
+            self.metrics.count("batched_calls", min(DRIVE_BATCH_SIZE, len(requests) - start))
+
+        return results
+
+    def iter_drive_folder_pages(self, query, fields):
+        """
+        Stream pages of a Drive files().list() query, following nextPageToken
+
+        Yields each page's file list as soon as it arrives, so callers can
+        start using results before the whole folder has been listed.
+
+        Args:
+            query (str): Drive search query ('q' parameter)
+            fields (str): Per-file fields to request, e.g. "name, id"
+
+        Yields:
+            list: The 'files' entries of one page
+        """
+        page_token = None
+        while True:
             results = self.service.files().list(
                 q=query,
-                fields="files(name, id, createdTime, size)"
+                pageSize=DRIVE_PAGE_SIZE,  # Largest page Drive allows = fewest round trips
+                pageToken=page_token,
+                fields=f"nextPageToken, files({fields})"
             ).execute()
-            
-            files = results.get('files', [])
-            self.drive_files = {}
-            
-            print(f"Found {len(files)} files in Google Drive folder:")
+            self.metrics.count("api_calls", call="files.list")
+
+            yield results.get('files', [])
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+    def drive_file_entry(self, file):
+        """Build the drive_files record for a Drive API file resource"""
+        return {
+            'id': file['id'],
+            'created': file.get('createdTime', 'Unknown'),
+            'size': file.get('size', '0'),
+            'md5': file.get('md5Checksum')  # Content hash for dedup/change detection
+        }
+
+    def load_drive_state(self):
+        """
+        Load drive_files and the Changes API token saved by the last run
+
+        Returns:
+            bool: True if usable state for DRIVE_FOLDER_ID was found
+        """
+        if not os.path.exists(DRIVE_STATE_FILE):
+            return False
+        try:
+            with open(DRIVE_STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"Error reading Drive state: {e}")
+            return False
+
+        if state.get('folder_id') != DRIVE_FOLDER_ID or not state.get('start_page_token'):
+            return False
+        # Flat and partitioned runs track different folders - switching means starting over
+        if state.get('partitioned', False) != self.partition_by_date:
+            return False
+
+        self.drive_files = state.get('files', {})
+        self.drive_page_token = state['start_page_token']
+        self.listed_partitions = set(state.get('listed_partitions', []))
+        return True
+
+    def save_drive_state(self):
+        """Save drive_files and the Changes API token for the next run"""
+        try:
+            with self.log_lock:
+                state = {
+                    'folder_id': DRIVE_FOLDER_ID,
+                    'start_page_token': self.drive_page_token,
+                    'partitioned': self.partition_by_date,
+                    'listed_partitions': sorted(self.listed_partitions),
+                    'files': self.drive_files
+                }
+                temp_path = DRIVE_STATE_FILE + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(temp_path, DRIVE_STATE_FILE)
+        except Exception as e:
+            print(f"Error saving Drive state: {e}")
+
+    def sync_drive_changes(self):
+        """
+        Bring drive_files up to date with only what changed since drive_page_token
+
+        Costs one request per page of changes instead of listing the whole
+        folder. Files renamed, trashed or moved out of the folder (or out
+        of its known YYYY/MM subfolders) are dropped; new and edited ones
+        are added.
+
+        Raises:
+            HttpError: If the saved token is rejected (caller does a full scan)
+        """
+        scan_start = time.time()
+        page_token = self.drive_page_token
+        page_count = 0
+        change_count = 0
+        names_by_id = {info['id']: name for name, info in self.drive_files.items()}
+        # Files can live in the folder itself or (partitioned) in a YYYY/MM subfolder of it
+        watched_parents = {DRIVE_FOLDER_ID}
+        if self.partition_by_date:
+            watched_parents.update(folder_id for path, folder_id in self.load_drive_folder_index().items()
+                                   if "/" in path)
+
+        while page_token:
+            results = self.service.changes().list(
+                pageToken=page_token,
+                pageSize=DRIVE_PAGE_SIZE,
+                spaces='drive',
+                includeRemoved=True,
+                fields=f"nextPageToken, newStartPageToken, "
+                       f"changes(fileId, removed, file({DRIVE_FILE_FIELDS}, mimeType, parents, trashed))"
+            ).execute()
+            self.metrics.count("api_calls", call="changes.list")
+            page_count += 1
+
+            for change in results.get('changes', []):
+                # Forget whatever this file was before (it may have been renamed)
+                old_name = names_by_id.pop(change['fileId'], None)
+                if old_name is not None:
+                    self.drive_files.pop(old_name, None)
+
+                file = change.get('file')
+                change_count += 1
+                if (change.get('removed') or not file or file.get('trashed')
+                        or file.get('mimeType') == DRIVE_FOLDER_MIME
+                        or not watched_parents.intersection(file.get('parents', []))):
+                    continue
+
+                self.drive_files[file['name']] = self.drive_file_entry(file)
+                names_by_id[file['id']] = file['name']
+
+            if 'newStartPageToken' in results:
+                # Caught up - this is where the next run starts
+                self.drive_page_token = results['newStartPageToken']
+                break
+            page_token = results.get('nextPageToken')
+
+        scan_latency = time.time() - scan_start
+        self.drive_scan_stats = {
+            "mode": "changes",
+            "pages": page_count,
+            "changes": change_count,
+            "files": len(self.drive_files),
+            "latency_seconds": round(scan_latency, 3)
+        }
+
+        print(f"Applied {change_count} Drive change(s) since last run - {len(self.drive_files)} files known")
+        print(f"Scan latency: {scan_latency:.2f}s over {page_count} page(s)")
+
+    def list_drive_folder(self):
+        """List every file in the Drive folder into drive_files (full scan)"""
+        # Query for all files in the specific Drive folder (YYYY subfolders are listed per partition)
+        query = f"'{DRIVE_FOLDER_ID}' in parents and trashed=false and mimeType != '{DRIVE_FOLDER_MIME}'"
+        self.drive_files = {}
+        self.listed_partitions = set()
+
+        scan_start = time.time()
+        page_count = 0
+
+        # Fill drive_files page by page as results stream in
+        for files in self.iter_drive_folder_pages(query, DRIVE_FILE_FIELDS):
+            page_count += 1
+            page_bytes = 0
+
             for file in files:
-                filename = file['name']
-                file_id = file['id']
-                created_time = file.get('createdTime', 'Unknown')
                 file_size = file.get('size', '0')
-                
-                # Convert size to MB for display
-                size_mb = int(file_size) / (1024 * 1024) if file_size.isdigit() else 0
-                
-                self.drive_files[filename] = {
-                    'id': file_id,
-                    'created': created_time,
-                    'size': file_size
-                }
-                
-                print(f"  {filename} ({size_mb:.2f} MB)")
-            
-            print(f"Google Drive scan completed - {len(self.drive_files)} files found")
+                if file_size.isdigit():
+                    page_bytes += int(file_size)
+
+                self.drive_files[file['name']] = self.drive_file_entry(file)
+
+            elapsed = time.time() - scan_start
+            pages_per_second = page_count / elapsed if elapsed > 0 else 0
+            print(f"  Page {page_count}: {len(files)} files "
+                  f"({page_bytes / (1024 * 1024):.2f} MB) - "
+                  f"{len(self.drive_files)} total, {pages_per_second:.1f} pages/s")
+
+        scan_latency = time.time() - scan_start
+        pages_per_second = page_count / scan_latency if scan_latency > 0 else 0
+
+        # Keep the numbers around so we can track how the scan scales with folder size
+        self.drive_scan_stats = {
+            "mode": "full",
+            "pages": page_count,
+            "files": len(self.drive_files),
+            "latency_seconds": round(scan_latency, 3),
+            "pages_per_second": round(pages_per_second, 2)
+        }
+
+        print(f"Google Drive scan completed - {len(self.drive_files)} files found")
+        print(f"Scan latency: {scan_latency:.2f}s over {page_count} page(s) "
+              f"({pages_per_second:.1f} pages/s)")
+
+    def load_drive_folder_index(self):
+        """
+        YYYY and YYYY/MM subfolder IDs found or created by earlier runs
+
+        Returns:
+            dict: "YYYY" / "YYYY/MM" -> Drive folder ID (also kept in self.drive_folders)
+        """
+        if self.drive_folders is not None:
+            return self.drive_folders
+        self.drive_folders = {}
+        if os.path.exists(DRIVE_FOLDER_INDEX_FILE):
+            try:
+                with open(DRIVE_FOLDER_INDEX_FILE, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                # Only valid for the folder it was built for
+                if index.get('root') == DRIVE_FOLDER_ID:
+                    self.drive_folders = index.get('folders', {})
+            except Exception as e:
+                print(f"Error reading Drive folder index: {e}")
+        return self.drive_folders
+
+    def save_drive_folder_index(self):
+        try:
+            temp_path = DRIVE_FOLDER_INDEX_FILE + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'root': DRIVE_FOLDER_ID, 'folders': self.drive_folders}, f, ensure_ascii=False)
+            os.replace(temp_path, DRIVE_FOLDER_INDEX_FILE)
+        except Exception as e:
+            print(f"Error saving Drive folder index: {e}")
+
+    def partition_for(self, file_path):
+        """YYYY/MM partition of a local file, from its modification (capture) time"""
+        return datetime.fromtimestamp(self.get_file_stat(file_path)[1]).strftime("%Y/%m")
+
+    def resolve_drive_folders(self, paths, create):
+        """
+        Find (and optionally create) YYYY or YYYY/MM folders not in the folder index yet
+
+        Lookups go out as one batched request and creations as another,
+        however many folders are involved. All `paths` must be at the
+        same depth, with their parents already resolved.
+
+        Returns:
+            list: Paths that were created
+        """
+        folders = self.load_drive_folder_index()
+
+        def parent_id(path):
+            return folders[path.rsplit("/", 1)[0]] if "/" in path else DRIVE_FOLDER_ID
+
+        paths = sorted(path for path in set(paths) if path not in folders)
+        if not paths:
+            return []
+
+        lookups = [self.service.files().list(
+                       q=f"name = '{path.rsplit('/', 1)[-1]}' and '{parent_id(path)}' in parents "
+                         f"and mimeType = '{DRIVE_FOLDER_MIME}' and trashed = false",
+                       pageSize=1, fields="files(id)")
+                   for path in paths]
+        to_create = []
+        for path, (response, error) in zip(paths, self.execute_batch(lookups)):
+            if error is not None:
+                raise error
+            found = response.get('files', [])
+            if found:
+                folders[path] = found[0]['id']
+            elif create:
+                to_create.append(path)
+
+        if to_create:
+            creations = [self.service.files().create(
+                             body={'name': path.rsplit('/', 1)[-1], 'mimeType': DRIVE_FOLDER_MIME,
+                                   'parents': [parent_id(path)]},
+                             fields='id')
+                         for path in to_create]
+            for path, (response, error) in zip(to_create, self.execute_batch(creations)):
+                if error is not None:
+                    raise error
+                folders[path] = response['id']
+            print(f"Created Drive folder(s): {', '.join(to_create)}")
+
+        self.save_drive_folder_index()
+        return to_create
+
+    def resolve_partitions(self, partitions, create):
+        """
+        Resolve YYYY/MM partitions to folder IDs: years first, then months
+
+        Returns:
+            list: Partitions whose month folder was created just now
+        """
+        self.resolve_drive_folders({partition.split("/")[0] for partition in partitions}, create)
+        folders = self.drive_folders
+        return self.resolve_drive_folders([partition for partition in partitions
+                                           if partition.split("/")[0] in folders], create)
+
+    def ensure_partitions_listed(self, file_list):
+        """
+        Make sure drive_files covers the YYYY/MM partitions of `file_list`
+
+        Partitions are listed the first time a run needs them and then
+        kept current by the Changes API, so a scan only ever lists
+        partitions that hold new or changed local files.
+        """
+        partitions = {self.partition_for(file_path) for file_path in file_list} - self.listed_partitions
+        if not partitions:
+            return
+
+        list_start = time.time()
+        self.resolve_partitions(partitions, create=False)
+        file_count = 0
+        listed_count = 0
+        for partition in sorted(partitions):
+            folder_id = self.drive_folders.get(partition)
+            if folder_id is None:
+                continue  # No such folder yet - look again next time, someone may create it
+            query = f"'{folder_id}' in parents and trashed=false and mimeType != '{DRIVE_FOLDER_MIME}'"
+            for files in self.iter_drive_folder_pages(query, DRIVE_FILE_FIELDS):
+                for file in files:
+                    self.drive_files[file['name']] = self.drive_file_entry(file)
+                file_count += len(files)
+            self.listed_partitions.add(partition)
+            listed_count += 1
+
+        print(f"Listed {listed_count} date partition(s) in Drive ({file_count} files, "
+              f"{time.time() - list_start:.2f}s)")
+        if listed_count:
+            self.save_drive_state()
+
+    def prepare_partition_folders(self, file_list):
+        """
+        Pick the YYYY/MM folder each file goes into, creating missing folders
+
+        Runs before the upload workers start, so two workers never race to
+        create the same folder. Fills upload_parents.
+        """
+        self.upload_parents = {}
+        if not self.partition_by_date or not file_list:
+            return
+
+        partitions = {file_path: self.partition_for(file_path) for file_path in file_list}
+        try:
+            created = self.resolve_partitions(set(partitions.values()), create=True)
+        except HttpError as error:
+            print(f"Could not set up date folders ({error}) - uploading into the main folder")
+            return
+
+        # A folder we just created is empty, so there is nothing to list there
+        if created:
+            self.listed_partitions.update(created)
+            self.save_drive_state()
+        self.upload_parents = {file_path: self.drive_folders[partition]
+                               for file_path, partition in partitions.items()}
+
+    def scan_google_drive_folder(self):
+        """
+        Find out what files already exist in the Google Drive folder
+
+        Normally only fetches what changed since the last run (Drive
+        Changes API). Lists the whole folder on the first run, with
+        --full-scan, or when the saved token is no longer valid. With
+        --partition-by-date that covers the top folder only; YYYY/MM
+        subfolders are listed on demand by ensure_partitions_listed.
+        """
+        print("\nScanning Google Drive folder for existing files...")
+
+        try:
+            if not self.full_scan and (self.drive_page_token or self.load_drive_state()):
+                try:
+                    self.sync_drive_changes()
+                    self.save_drive_state()
+                    return True
+                except HttpError as error:
+                    if getattr(error.resp, 'status', None) not in (400, 404, 410):
+                        raise
+                    print(f"Saved Drive change token is no longer valid ({error}) - doing a full scan")
+
+            # Take the token *before* listing, so changes made during the listing
+            # still show up in the next run's delta
+            start_token = self.service.changes().getStartPageToken().execute().get('startPageToken')
+            self.metrics.count("api_calls", call="changes.getStartPageToken")
+            self.list_drive_folder()
+            self.drive_page_token = start_token
+            self.save_drive_state()
             return True
-            
+
         except HttpError as error:
             print(f"Error scanning Google Drive folder: {error}")
             return False
+        except Exception as error:
+            # Connection reset, timeout, DNS failure (httplib2.ServerNotFoundError), ...
+            print(f"Error scanning Google Drive folder ({type(error).__name__}): {error}")
+            return False
     
-    def get_all_screenshots(self):
-        """Find ALL .jpg files in the local folder"""
-        print(f"\nScanning local folder: {LOCAL_FOLDER}")
-        if not os.path.exists(LOCAL_FOLDER):
-            print(f"Folder does not exist: {LOCAL_FOLDER}")
-            return []
-            
-        jpg_pattern = os.path.join(LOCAL_FOLDER, "*.jpg")
-        jpg_files = glob.glob(jpg_pattern)
-        
-        print(f"📊 Found {len(jpg_files)} .jpg files in local folder")
-        return jpg_files
-    
+    def get_source_folders(self):
+        """Folders captures are picked up from (LOCAL_FOLDER unless --source was given)"""
+        return self.source_folders or [LOCAL_FOLDER]
+
+    def names_can_collide(self):
+        """True if two local captures could share a filename (several folders are scanned)"""
+        return self.recursive or len(self.get_source_folders()) > 1
+
+    def drive_name_for(self, file_path):
+        """
+        Name a local capture gets in Drive (and in the upload log and backups)
+
+        Files directly in the first source folder keep their own name, as
+        always. Files in subfolders (--recursive) or in further --source
+        folders get the folder names folded in, e.g. "clips__shot.jpg" or
+        "Game__shot.jpg", so same-named captures never share a Drive file.
+        """
+        if not self.names_can_collide():
+            return os.path.basename(file_path)
+
+        if self.source_roots is None:
+            self.source_roots = []
+            prefixes = set()
+            for position, folder in enumerate(self.get_source_folders()):
+                folder = os.path.abspath(folder)
+                prefix = None
+                if position:
+                    # Extra folders are told apart by their name ("Game", "Game2" if two share it)
+                    base = os.path.basename(folder.rstrip(os.sep)) or "source"
+                    prefix, number = base, 1
+                    while prefix in prefixes:
+                        number += 1
+                        prefix = f"{base}{number}"
+                    prefixes.add(prefix)
+                self.source_roots.append((os.path.normcase(folder).rstrip(os.sep) + os.sep, folder, prefix))
+
+        path = os.path.abspath(file_path)
+        normalized = os.path.normcase(path)
+        for root, folder, prefix in self.source_roots:
+            if normalized.startswith(root):
+                parts = os.path.relpath(path, folder).split(os.sep)
+                if prefix:
+                    parts.insert(0, prefix)
+                return DRIVE_NAME_SEPARATOR.join(parts)
+        return os.path.basename(file_path)
+
+    def claim_drive_name(self, file_path):
+        """
+        Reserve this file's Drive name for it
+
+        Returns:
+            str or None: Path that already owns the name (the file must
+                         not be uploaded over it), or None if it's ours
+        """
+        if not self.names_can_collide():
+            return None
+        owner = self.drive_name_owners.setdefault(self.drive_name_for(file_path), file_path)
+        return owner if owner != file_path else None
+
+    def scan_directory(self, path):
+        """
+        One scandir pass over a single directory (runs in a walker thread)
+
+        Returns:
+            tuple: ([(file path, (size, mtime, inode)), ...] of matching files,
+                    [(subfolder path, stat), ...] when walking recursively)
+        """
+        files, subfolders = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive:
+                            subfolders.append((entry.path, entry.stat(follow_symlinks=False)))
+                        continue
+                    if not is_screenshot_name(entry.name, self.patterns):
+                        continue
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    # st_ino is 0 on Windows scandir results; size + mtime still catch changes there
+                    files.append((entry.path, (st.st_size, st.st_mtime, st.st_ino)))
+        except OSError as e:
+            print(f"Could not scan {path}: {e}")
+        return files, subfolders
+
+    def iter_local_screenshots(self):
+        """
+        Yield (path, (size, mtime, inode)) for every capture in the source folders
+
+        Directories are scanned by a pool of walker threads (scandir and
+        stat release the GIL), and each directory's matches are yielded
+        as soon as it is done, so the tree is never held as one list.
+        Every directory is walked once and every file yielded once, even
+        when source folders overlap.
+        """
+        def folder_key(path, st):
+            # Windows scandir stats have no inode (st_ino 0) - os.stat() has the real file ID,
+            # so roots and subfolders get the same kind of key
+            if not st.st_ino:
+                st = os.stat(path)
+            return (st.st_dev, st.st_ino) if st.st_ino else os.path.normcase(os.path.abspath(path))
+
+        seen_folders = set()
+        seen_files = set()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan") as pool:
+            for root in self.get_source_folders():
+                try:
+                    st = os.stat(root)
+                except OSError:
+                    print(f"Folder does not exist: {root}")
+                    continue
+                key = folder_key(root, st)
+                if key not in seen_folders:
+                    seen_folders.add(key)
+                    pending.add(pool.submit(self.scan_directory, root))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subfolders = future.result()
+                    for path, st in subfolders:
+                        try:
+                            key = folder_key(path, st)
+                        except OSError:
+                            continue  # Removed since it was listed
+                        if key not in seen_folders:
+                            seen_folders.add(key)
+                            pending.add(pool.submit(self.scan_directory, path))
+                    for path, stat in files:
+                        if path not in seen_files:
+                            seen_files.add(path)
+                            yield path, stat
+
+    def scan_local_changes(self):
+        """
+        Scan the local folder and keep only files that are new or changed
+
+        Files whose (size, mtime, inode) match the persisted index need no
+        Drive lookup at all, so they are counted and dropped while the scan
+        streams - only new or changed files (and their stats) are kept.
+        Index entries are moved to a fresh index as files are seen, which
+        prunes files that are gone locally without a second copy of it.
+
+        Returns:
+            list: Files that are new or changed and must be checked against Drive
+        """
+        source_folders = self.get_source_folders()
+        print(f"\nScanning local folder(s): {', '.join(source_folders)}"
+              f"{' (with subfolders)' if self.recursive else ''}")
+        self.local_file_count = 0
+        self.local_stats = {}
+
+        scan_start = time.time()
+        old_index = self.local_index
+        new_index = {}
+        changed_files = []
+
+        self.drive_name_owners = {}
+        track_names = self.names_can_collide()
+        for file_path, stat in self.iter_local_screenshots():
+            self.local_file_count += 1
+            if track_names and file_path in old_index:
+                self.claim_drive_name(file_path)  # Already-synced files keep their names
+            synced = old_index.pop(file_path, None)
+            if (synced == list(stat) and not self.full_scan
+                    and not (self.destinations and self.destinations_missing(file_path, stat))):
+                new_index[file_path] = synced
+            else:
+                self.local_stats[file_path] = stat
+                changed_files.append(file_path)
+
+        # Whatever is left in the old index no longer exists locally
+        if old_index:
+            self.local_index_dirty = True
+        self.local_index = new_index
+
+        print(f"📊 Found {self.local_file_count} {'/'.join(self.patterns)} files in {len(source_folders)} "
+              f"folder(s) ({time.time() - scan_start:.2f}s)")
+        if self.full_scan:
+            print("Full scan requested - checking every local file against Google Drive")
+        else:
+            print(f"Unchanged since last sync: {self.local_file_count - len(changed_files)}")
+            print(f"New or changed locally: {len(changed_files)}")
+        return changed_files
+
+    def get_changed_screenshots(self, file_list):
+        """
+        Drop files whose current version the index already confirmed in Drive
+
+        For small batches whose stats are already in local_stats (watch
+        mode); full folder scans go through scan_local_changes instead.
+        """
+        if self.full_scan:
+            return list(file_list)
+        return [file_path for file_path in file_list
+                if self.local_index.get(file_path) != list(self.get_file_stat(file_path))
+                or (self.destinations and self.destinations_missing(file_path))]
+
     def get_missing_screenshots(self, all_local_files):
-        """Compare local files with Google Drive files to find missing ones"""
+        """
+        Compare local files with Google Drive files to find missing ones
+
+        Matches by content (MD5) first, so a renamed copy of something
+        already in Drive is skipped and a same-named file with edited
+        content is re-synced. Falls back to the filename when Drive has
+        no checksum for a file.
+        """
+        if self.partition_by_date:
+            self.ensure_partitions_listed(all_local_files)
+
         print("\nComparing local folder with Google Drive folder...")
-        missing_files = []
-        
+        # One line per file is useful for a handful of captures, noise for thousands
+        verbose = len(all_local_files) <= PLAN_VERBOSE_LIMIT
+        counts = {"already_in_drive": 0, "copy_in_drive": 0, "copy_in_plan": 0, "in_bundle": 0, "changed": 0,
+                  "missing": 0, "name_conflict": 0}
+        missing_files = []  # (mtime, path) so sorting needs no extra stat calls
+
+        drive_hashes = {info['md5']: name for name, info in self.drive_files.items() if info.get('md5')}
+
+        # Never upload over (or judge by) a Drive file that belongs to another local path
         for file_path in all_local_files:
+            owner = self.claim_drive_name(file_path)
+            if owner:
+                counts["name_conflict"] += 1
+                print(f"⚠️  Skipping {file_path}: its Drive name '{self.drive_name_for(file_path)}' "
+                      f"is already used by {owner} - rename one of them")
+        if counts["name_conflict"]:
+            all_local_files = [file_path for file_path in all_local_files
+                               if self.drive_name_owners[self.drive_name_for(file_path)] == file_path]
+
+        # First pass: hash in windows (results land in hash_cache) and find the
+        # Drive files about to get new content - they can't serve as a copy of anything else
+        hash_start = time.time()
+        replaced_names = set()
+        unreadable = set()
+        for start in range(0, len(all_local_files), PLAN_HASH_WINDOW):
+            window = all_local_files[start:start + PLAN_HASH_WINDOW]
+            for file_path, local_md5 in self.hash_local_files(window).items():
+                if local_md5 is None:
+                    unreadable.add(file_path)
+                    continue
+                drive_name, content_md5s = self.drive_identity(file_path, local_md5)
+                drive_md5 = self.drive_files.get(drive_name, {}).get('md5')
+                if (drive_md5 and drive_md5 not in content_md5s
+                        and not any(md5 in drive_hashes for md5 in content_md5s)):
+                    replaced_names.add(drive_name)
+        print(f"Hashed {len(all_local_files)} local file(s) in {time.time() - hash_start:.2f}s")
+        drive_hashes = {md5: name for md5, name in drive_hashes.items() if name not in replaced_names}
+        planned_hashes = {}  # MD5 -> Drive name of a file this batch will upload
+        
+        # Second pass: classify each file, reading hashes back from the cache. Oldest first,
+        # so of several identical new files the original capture is the one uploaded
+        for file_path in sorted(all_local_files, key=lambda file_path: (self.get_file_stat(file_path)[1], file_path)):
             filename = os.path.basename(file_path)
+            local_md5 = None if file_path in unreadable else self.get_file_md5(file_path)
+            drive_name, content_md5s = self.drive_identity(file_path, local_md5)
+            drive_file = self.drive_files.get(drive_name)
+            # Drive name holding the same bytes (or this file's --transcode output), if any
+            match = next((drive_hashes[md5] for md5 in content_md5s if md5 and md5 in drive_hashes), None)
+            planned = next((planned_hashes[md5] for md5 in content_md5s if md5 and md5 in planned_hashes), None)
             
-            # Check if file exists in Google Drive
-            if filename not in self.drive_files:
-                missing_files.append(file_path)
-                print(f"Missing in Drive: {filename}")
+            # Same bytes already in Drive (under this name or another one)
+            if match:
+                self.mark_synced(file_path)
+                if match == drive_name:
+                    counts["already_in_drive"] += 1
+                    if verbose:
+                        print(f"Already in Drive: {filename}")
+                else:
+                    counts["copy_in_drive"] += 1
+                    if verbose:
+                        print(f"Already in Drive as '{match}': {filename}")
+            elif planned:
+                # Same bytes as a file earlier in this batch - one upload is enough. Left unsynced,
+                # so the next diff matches it against that upload (or queues it if the upload failed)
+                counts["copy_in_plan"] += 1
+                if verbose:
+                    print(f"Same content as '{planned}', already planned: {filename}")
+            elif self.bundle_holding(local_md5):
+                # Uploaded inside a --bundle-small-files archive (by any earlier run, flag or not)
+                self.mark_synced(file_path)
+                counts["in_bundle"] += 1
+                if verbose:
+                    print(f"Already in Drive in '{self.bundle_holding(local_md5)}': {filename}")
+            elif drive_file and not (local_md5 and drive_file.get('md5')):
+                # Nothing to compare content with - trust the name like before
+                self.mark_synced(file_path)
+                counts["already_in_drive"] += 1
+                if verbose:
+                    print(f"Already in Drive: {filename}")
+            elif drive_file:
+                missing_files.append((self.get_file_stat(file_path)[1], file_path))
+                planned_hashes.update((md5, drive_name) for md5 in content_md5s if md5)
+                counts["changed"] += 1
+                if verbose:
+                    print(f"Changed since last upload: {filename}")
             else:
-                print(f"Already in Drive: {filename}")
+                missing_files.append((self.get_file_stat(file_path)[1], file_path))
+                planned_hashes.update((md5, drive_name) for md5 in content_md5s if md5)
+                counts["missing"] += 1
+                if verbose:
+                    print(f"Missing in Drive: {filename}")
+
+        self.save_hash_cache()
         
         # Sort by modification time (oldest first) to upload in chronological order
-        missing_files.sort(key=os.path.getmtime)
+        missing_files.sort()
+        missing_files = [file_path for _, file_path in missing_files]
         
         print(f"\nComparison Results:")
-        print(f"Local files: {len(all_local_files)}")
+        print(f"Local files checked: {len(all_local_files)}")
         print(f"Drive files: {len(self.drive_files)}")
+        print(f"Already in Drive: {counts['already_in_drive']} (+{counts['copy_in_drive']} as a renamed copy)")
+        if counts["copy_in_plan"]:
+            print(f"Duplicates of a file in this batch (not uploaded twice): {counts['copy_in_plan']}")
+        if counts["in_bundle"]:
+            print(f"Already in Drive inside a bundle: {counts['in_bundle']}")
+        if counts["name_conflict"]:
+            print(f"Skipped because of a Drive name clash: {counts['name_conflict']}")
+        print(f"Changed since last upload: {counts['changed']}")
         print(f"Missing files to upload: {len(missing_files)}")
+
+        if self.destinations:
+            missing_files = self.plan_destinations(all_local_files, missing_files)
         
         return missing_files
     
+    def order_by_priority(self, file_list, carried_over=None):
+        """
+        Sort files for upload by self.priority (oldest/newest modification time, or smallest size)
+
+        Files in `carried_over` (what an earlier time-budgeted run had to
+        leave, from deferred_uploads.json) go first, so a run that keeps
+        getting cut short doesn't starve them behind newer captures.
+        """
+        if self.priority == "smallest":
+            ordered = sorted(file_list, key=lambda file_path: self.get_file_stat(file_path)[0])
+        else:
+            ordered = sorted(file_list, key=lambda file_path: self.get_file_stat(file_path)[1],
+                             reverse=self.priority == "newest")
+        if not carried_over:
+            return ordered
+        carried_over = set(carried_over)
+        return ([file_path for file_path in ordered if file_path in carried_over]
+                + [file_path for file_path in ordered if file_path not in carried_over])
+
+    def fit_time_budget(self, file_list):
+        """
+        Pick the files, in priority order, that fit in the time left before the deadline
+
+        Uses estimate_upload_model() (recent MB/s from the detailed log).
+        A file too big for what is left is skipped so smaller ones after
+        it can still go.
+
+        Returns:
+            tuple: (files to upload now, files left for the next run)
+        """
+        seconds_left = self.deadline - time.monotonic()
+        model = estimate_upload_model()
+        parallelism = min(model["parallelism"], max(1, self.workers))
+        print(f"\n⏳ Time budget: {max(seconds_left, 0):.1f}s left for uploads "
+              f"(estimate from {model['samples']} recent upload(s): {model['mb_per_second']:.2f} MB/s + "
+              f"{model['overhead']:.2f}s per file, {parallelism:.1f} at a time)")
+
+        selected, deferred = [], []
+        planned_seconds = 0.0
+        for file_path in file_list:
+            size_mb = self.get_file_stat(file_path)[0] / (1024 * 1024)
+            estimate = (model["overhead"] + size_mb / model["mb_per_second"]) / parallelism
+            if planned_seconds + estimate <= seconds_left:
+                selected.append(file_path)
+                planned_seconds += estimate
+            else:
+                deferred.append(file_path)
+
+        print(f"Uploading {len(selected)} file(s) now (~{planned_seconds:.1f}s), "
+              f"leaving {len(deferred)} for the next run")
+        return selected, deferred
+
+    def load_deferred_uploads(self):
+        """Files an earlier time-budgeted run left for later"""
+        if not os.path.exists(DEFERRED_UPLOADS_FILE):
+            return None
+        try:
+            with open(DEFERRED_UPLOADS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading deferred uploads: {e}")
+            return None
+
+    def save_deferred_uploads(self, mode, file_list):
+        """Checkpoint what this run left for later (or clear the checkpoint if nothing)"""
+        try:
+            if not file_list:
+                if os.path.exists(DEFERRED_UPLOADS_FILE):
+                    os.remove(DEFERRED_UPLOADS_FILE)
+                return
+            temp_path = DEFERRED_UPLOADS_FILE + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"timestamp": datetime.now().isoformat(), "mode": mode, "files": file_list},
+                          f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, DEFERRED_UPLOADS_FILE)
+            print(f"📌 {len(file_list)} file(s) checkpointed for the next run ({DEFERRED_UPLOADS_FILE})")
+        except Exception as e:
+            print(f"Error saving deferred uploads: {e}")
+
     def show_upload_preview(self, file_list):
         """Show user what will be uploaded and ask for confirmation"""
         if not file_list:
@@ -376,21 +3177,26 @@ class ScreenshotUploader:
         print(f"\nUPLOAD PREVIEW - Found {len(file_list)} file(s) missing from Google Drive:")
         print("=" * 70)
         
+        total_bytes = 0
         for i, file_path in enumerate(file_list, 1):
+            file_size, file_mod_time, _ = self.get_file_stat(file_path)
+            total_bytes += file_size
+            if i > PLAN_VERBOSE_LIMIT:
+                continue  # Still counted in the totals below
             filename = os.path.basename(file_path)
-            file_date = datetime.fromtimestamp(os.path.getmtime(file_path))
-            file_size = os.path.getsize(file_path)
+            file_date = datetime.fromtimestamp(file_mod_time)
             file_size_mb = file_size / (1024 * 1024)  # Convert to MB
             
             print(f"{i:2d}. {filename}")
             print(f"     Date: {file_date.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"     Size: {file_size_mb:.2f} MB")
             print()
+        if len(file_list) > PLAN_VERBOSE_LIMIT:
+            print(f"... and {len(file_list) - PLAN_VERBOSE_LIMIT} more")
         
         print("=" * 70)
         print(f"Total files: {len(file_list)}")
-        total_size = sum(os.path.getsize(f) for f in file_list) / (1024 * 1024)
-        print(f"Total size: {total_size:.2f} MB")
+        print(f"Total size: {total_bytes / (1024 * 1024):.2f} MB")
         print(f"Destination: Google Drive → AI Road → Capturas de pantalla")
         print("=" * 70)
 
@@ -411,10 +3217,40 @@ class ScreenshotUploader:
             else:
                 print("Please enter 'y' for yes or 'n' for no")
     
-    def upload_to_drive(self, file_path):
-        """Upload a file to Google Drive"""
-        filename = os.path.basename(file_path)
-        file_mod_time = os.path.getmtime(file_path)
+    def upload_to_drive(self, file_path, service=None, file_detail=None, stream=None):
+        """
+        Upload a file to Google Drive in resumable chunks
+
+        If an earlier run was cut off in the middle of this file, the saved
+        session is picked up and only the remaining bytes are sent. A file
+        whose name is already in Drive (with different content) replaces
+        that Drive file's content instead of creating a duplicate.
+
+        Args:
+            file_path (str): Path to file to upload
+            service: Drive client to use (defaults to self.service; upload
+                     workers pass their own thread-local client)
+            file_detail (dict, optional): Detailed log record to add
+                                          per-chunk throughput to
+            stream (SharedFileView, optional): Read the bytes from here
+                   instead of the file (shared with extra destinations)
+
+        Returns:
+            bool: True once the upload has finished
+
+        Raises:
+            HttpError: If Drive rejects the upload, so callers can decide
+                       whether to retry
+        """
+        # --transcode may have prepared a smaller re-encoded copy to send instead
+        upload_path, filename, mimetype = self.prepared_uploads.get(
+            file_path, (file_path, self.drive_name_for(file_path), mime_type_for(file_path)))
+        file_size, file_mod_time, _ = self.get_file_stat(file_path)
+        source_size = file_size
+        if upload_path != file_path:
+            file_size = os.path.getsize(upload_path)
+        service = service or self.service
+        chunk_log = []
         
         try:
             print(f"Starting upload of '{filename}'...")
@@ -422,21 +3258,72 @@ class ScreenshotUploader:
             # Prepare file metadata
             file_metadata = {
                 'name': filename,
-                'parents': [DRIVE_FOLDER_ID]
+                'parents': [self.upload_parents.get(file_path, DRIVE_FOLDER_ID)]
             }
+            existing_file = self.drive_files.get(filename)
             
-            # Create media upload object
-            media = MediaFileUpload(file_path, mimetype='image/jpeg')
-            
-            # Upload the file
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
-            
-            # Update upload log
-            self.uploaded_files[filename] = file_mod_time
+            def create_request():
+                # Create media upload object - resumable, sent chunk_size bytes at a time
+                if stream is not None:
+                    media = MediaIoBaseUpload(stream, mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+                else:
+                    media = MediaFileUpload(upload_path, mimetype=mimetype,
+                                            chunksize=self.chunk_size, resumable=True)
+                if existing_file:
+                    # Edited screenshot - upload a new version of the same Drive file
+                    return service.files().update(
+                        fileId=existing_file['id'],
+                        media_body=media,
+                        fields='id, md5Checksum'
+                    )
+                return service.files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id, md5Checksum'
+                )
+
+            request = create_request()
+            resumed_from, file = self.restore_resume_session(request, file_path, file_size, file_mod_time)
+
+            try:
+                if file is None:
+                    file = self.send_upload_chunks(request, file_path, file_size, file_mod_time, chunk_log)
+            except HttpError as error:
+                # 404/410 = the saved session is gone on Drive's side; start over once
+                if resumed_from is None or getattr(error.resp, 'status', None) not in (404, 410):
+                    raise
+                print(f"Saved upload session for '{filename}' expired - restarting from byte 0")
+                self.update_resume_entry(file_path, None)
+                resumed_from = None
+                request = create_request()
+                file = self.send_upload_chunks(request, file_path, file_size, file_mod_time, chunk_log)
+
+            # Upload finished - the session can't be resumed any more
+            self.update_resume_entry(file_path, None)
+
+            # Update upload log (one journal line, not a full rewrite)
+            self.record_upload(filename, file_mod_time)
+            bundle_members = self.bundle_members.get(file_path)
+            if bundle_members:
+                self.record_bundle(file_path, file.get('id'), bundle_members, remove_archive=stream is None)
+            else:
+                self.mark_synced(file_path)
+            with self.log_lock:
+                self.drive_files[filename] = {
+                    'id': file.get('id'),
+                    'created': datetime.now(timezone.utc).isoformat(),
+                    'size': str(file_size),
+                    'md5': file.get('md5Checksum')
+                }
+
+            if file_detail is not None:
+                file_detail["chunks"] = chunk_log
+                if resumed_from is not None:
+                    file_detail["resumed_from_byte"] = resumed_from
+                if upload_path != file_path:
+                    file_detail["transcode"] = {"format": self.transcode_format, "original_bytes": source_size,
+                                                "uploaded_bytes": file_size,
+                                                "bytes_saved": source_size - file_size}
             
             print(f"Successfully uploaded '{filename}'")
             print(f"File ID: {file.get('id')}")
@@ -444,76 +3331,794 @@ class ScreenshotUploader:
             
         except HttpError as error:
             print(f"Error uploading '{filename}': {error}")
-            return False
+            if file_detail is not None:
+                file_detail["chunks"] = chunk_log
+            raise  # Let the retry logic classify it (rate limit, server error, ...)
+
+    def record_bundle(self, bundle_path, drive_id, members, remove_archive=True):
+        """Remember an uploaded bundle's members and mark them synced; drop the local archive"""
+        bundle_name = os.path.basename(bundle_path)
+        files = {self.drive_name_for(file_path): self.get_file_md5(file_path) for file_path in members}
+        self.load_bundle_manifest()
+        with self.log_lock:
+            self.bundle_manifest[bundle_name] = {"id": drive_id, "files": files}
+            self.bundled_md5s.update((md5, bundle_name) for md5 in files.values())
+        self.save_bundle_manifest()
+        for file_path in members:
+            self.mark_synced(file_path)
+        if not remove_archive:
+            return  # Extra destinations are still reading it
+        try:
+            os.remove(bundle_path)
+        except OSError:
+            pass
+
+    def destinations_missing(self, file_path, stat=None):
+        """Extra destinations whose upload log entry doesn't match this version of the file"""
+        filename = self.drive_name_for(file_path)
+        if stat is None:
+            try:
+                stat = self.get_file_stat(file_path)
+            except OSError:
+                return []
+        version = [stat[1], stat[0]]  # [mtime, size]
+        return [sink for sink in self.destinations
+                if (self.uploaded_files.get(f"{sink.name}|{filename}") or [])[:2] != version]
+
+    def record_destination(self, sink, file_path, ref):
+        """Log that an extra destination has this version of the file (ref = Drive ID or backup path)"""
+        file_size, file_mod_time, _ = self.get_file_stat(file_path)
+        self.record_upload(f"{sink.name}|{self.drive_name_for(file_path)}", [file_mod_time, file_size, ref])
+
+    def connect_destinations(self):
+        """Connect every extra destination once per run; ones that fail are skipped until the next run"""
+        if self.active_destinations is not None:
+            return
+        self.active_destinations = []
+        for sink in self.destinations:
+            try:
+                sink.connect(self)
+                self.active_destinations.append(sink)
+            except Exception as e:
+                print(f"Skipping destination {sink.name} this run: {e}")
+
+    def plan_destinations(self, file_list, missing_files):
+        """
+        Work out which extra destinations need which files
+
+        Files the main Drive folder already has but a mirror or backup
+        doesn't are added to the plan; upload_to_destinations sends each
+        planned file only where it's still missing.
+
+        Returns:
+            list: missing_files followed by files only extra destinations need
+        """
+        self.connect_destinations()
+        self.primary_plan = set(missing_files)
+        self.mirror_plan = {}
+        for file_path in file_list:
+            pending = [sink for sink in self.destinations_missing(file_path) if sink in self.active_destinations]
+            if pending:
+                self.mirror_plan[file_path] = pending
+
+        extra = sorted((self.get_file_stat(file_path)[1], file_path)
+                       for file_path in self.mirror_plan if file_path not in self.primary_plan)
+        for sink in self.active_destinations:
+            count = sum(1 for pending in self.mirror_plan.values() if sink in pending)
+            print(f"Missing in {sink.name}: {count}")
+        return missing_files + [file_path for _, file_path in extra]
+
+    def upload_to_destinations(self, file_path, service=None, file_detail=None):
+        """
+        Send one file to the main Drive folder and every extra destination that needs it
+
+        The file is read from disk once (SharedFileReader) and the same
+        blocks are streamed to all destinations in parallel. Extra
+        destinations that succeed are logged right away, so a retry only
+        goes where it failed; the file counts as synced once all have it.
+
+        Raises:
+            Exception: Whatever the main Drive upload raised, for the retry logic
+        """
+        sinks = self.mirror_plan.get(file_path)
+        if not sinks:
+            return self.upload_to_drive(file_path, service, file_detail)
+
+        upload_path, filename, mimetype = self.prepared_uploads.get(
+            file_path, (file_path, self.drive_name_for(file_path), mime_type_for(file_path)))
+        file_mod_time = self.get_file_stat(file_path)[1]
+        members = self.bundle_members.get(file_path, [file_path])
+        to_drive = file_path in self.primary_plan
+        reader = SharedFileReader(upload_path, (["drive"] if to_drive else []) + [sink.name for sink in sinks])
+
+        def send(sink):
+            send_start = time.time()
+            previous = None if file_path in self.bundle_members else \
+                self.uploaded_files.get(f"{sink.name}|{filename}")
+            try:
+                ref = sink.send(reader.view(sink.name), filename, mimetype, file_mod_time,
+                                previous[2] if previous else None)
+            finally:
+                reader.detach(sink.name)
+            return ref, time.time() - send_start
+
+        futures = [(self.sink_pool.submit(send, sink), sink) for sink in sinks]
+        error = None
+        try:
+            if to_drive:
+                self.upload_to_drive(file_path, service, file_detail, reader.view("drive"))
+                self.primary_plan.discard(file_path)
+        except Exception as e:
+            error = e
+        finally:
+            reader.detach("drive")
+            results = file_detail.setdefault("destinations", {}) if file_detail is not None else {}
+            for future, sink in futures:
+                try:
+                    ref, seconds = future.result()
+                except Exception as e:
+                    _, category = self.classify_error(e)
+                    results[sink.name] = {"success": False, "error": f"{category}: {e}"}
+                    print(f"Copy of '{filename}' to {sink.name} failed ({category}) - retried next run")
+                    continue
+                for member in members:
+                    self.record_destination(sink, member, ref)
+                sinks.remove(sink)
+                results[sink.name] = {"success": True, "seconds": round(seconds, 2)}
+                self.metrics.count("destination_uploads", sink=sink.name)
+            self.metrics.count("fanout_bytes_read", reader.bytes_read)
+            self.metrics.count("fanout_bytes_reread", reader.bytes_reread)
+            reader.close()
+
+        if error is not None:
+            raise error
+        for member in members:
+            self.mark_synced(member)
+        if file_path in self.bundle_members:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        return True
+
+    def query_upload_session(self, request, uri, file_size):
+        """
+        Ask Drive how much of a resumable session it has committed
+
+        Sends the empty "PUT, Content-Range: bytes */<size>" status request
+        from the resumable upload protocol over the request's own connection.
+
+        Returns:
+            tuple: (committed bytes, file resource if the upload already
+                   finished, else None); (None, None) if the session expired
+
+        Raises:
+            HttpError: For any other error status, so callers can retry
+        """
+        resp, content = request.http.request(uri, method='PUT', body=b'',
+                                             headers={'Content-Length': '0',
+                                                      'Content-Range': f'bytes */{file_size}'})
+        status = int(resp.status)
+        if status in (200, 201):
+            return file_size, json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+        if status == 308:
+            # "Range: bytes=0-<last byte>"; no header = nothing committed yet
+            committed = resp.get('range')
+            return (int(committed.rsplit('-', 1)[1]) + 1 if committed else 0), None
+        if status in (404, 410):
+            return None, None
+        raise HttpError(resp, content, uri=uri)
+
+    def restore_resume_session(self, request, file_path, file_size, file_mod_time):
+        """
+        Point a new upload request at a saved resumable session, if there is one
+
+        The session is only reused when the file on disk still has the same
+        size and modification time as when the session was started. Drive
+        is asked which bytes it actually committed, so a stale local offset
+        can never corrupt the upload.
+
+        Returns:
+            tuple: (byte offset the upload continues from or None if it
+                   starts from scratch, file resource if Drive already has
+                   the whole file or None)
+        """
+        with self.resume_lock:
+            entry = self.resume_state.get(file_path)
+
+        if not entry:
+            return None, None
+
+        if entry.get('size') != file_size or entry.get('mtime') != file_mod_time:
+            print(f"'{os.path.basename(file_path)}' changed since its upload was interrupted - starting over")
+            self.update_resume_entry(file_path, None)
+            return None, None
+
+        offset, finished = self.query_upload_session(request, entry['uri'], file_size)
+        if offset is None:
+            print(f"Saved upload session for '{os.path.basename(file_path)}' expired - restarting from byte 0")
+            self.update_resume_entry(file_path, None)
+            return None, None
+        if finished is not None:
+            # The last chunk got through but the run ended before logging it
+            print(f"'{os.path.basename(file_path)}' was already fully uploaded by the interrupted run")
+            return offset, finished
+
+        request.resumable_uri = entry['uri']
+        request.resumable_progress = offset
+        print(f"Resuming '{os.path.basename(file_path)}' from byte {offset:,} of {file_size:,}")
+        return offset, None
+
+    def send_upload_chunks(self, request, file_path, file_size, file_mod_time, chunk_log):
+        """
+        Send a resumable upload one chunk at a time
+
+        After every chunk the session URI and confirmed byte offset are
+        saved, so the next run can continue if this one is killed.
+
+        Args:
+            chunk_log (list): Receives one throughput record per chunk
+
+        Returns:
+            dict: Drive API response for the created file
+        """
+        response = None
+        last_offset = request.resumable_progress or 0
+
+        while response is None:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                # Out of time: stop on a chunk boundary; the saved session resumes it next run
+                raise UploadDeferred(f"time budget used up at byte {last_offset:,} of {file_size:,}")
+            chunk_start = time.time()
+            status, response = request.next_chunk()
+            chunk_time = time.time() - chunk_start
+
+            offset = status.resumable_progress if status else file_size
+            chunk_bytes = max(offset - last_offset, 0)
+            last_offset = offset
+            self.metrics.count("api_calls", call="upload_chunk")
+            self.metrics.count("bytes_sent", chunk_bytes)
+
+            chunk_log.append({
+                "chunk": len(chunk_log) + 1,
+                "bytes": chunk_bytes,
+                "seconds": round(chunk_time, 3),
+                "mb_per_second": round(chunk_bytes / (1024 * 1024) / chunk_time, 2) if chunk_time > 0 else None
+            })
+
+            if response is None:
+                print(f"  {os.path.basename(file_path)}: {offset / file_size * 100:.0f}% uploaded")
+                self.update_resume_entry(file_path, {
+                    'uri': request.resumable_uri,
+                    'offset': offset,
+                    'size': file_size,
+                    'mtime': file_mod_time,
+                    'updated': time.time()
+                })
+
+        return response
     
-    def upload_multiple_screenshots(self, file_list):
-        """Upload multiple screenshots"""
-        """Enhanced batch upload with retry logic and detailed reporting"""
-        if not file_list:
-            print("No files to upload")
-            return True
-        
-        successful_uploads = 0
-        failed_uploads = 0
-        file_details = []  # For detailed logging
-        
-        print(f"🚀 Starting batch upload of {len(file_list)} files...")
-        
-        for i, file_path in enumerate(file_list, 1):
-            filename = os.path.basename(file_path)
-            file_date = datetime.fromtimestamp(os.path.getmtime(file_path))
-            file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-            
-            print(f"\n--- Upload {i}/{len(file_list)} ---")
+    def upload_single_screenshot(self, file_path, position, total, service=None, file_detail=None):
+        """
+        Make one upload attempt for a screenshot
+
+        Args:
+            file_path (str): Path to file to upload
+            position (int): 1-based position of the file in the batch
+            total (int): Number of files in the batch
+            service: Drive client to upload with (None = self.service)
+            file_detail (dict, optional): Record from an earlier attempt of
+                                          the same file (None = first try)
+
+        Returns:
+            tuple: (file_detail: dict, error: Exception or None)
+        """
+        filename = os.path.basename(file_path)
+
+        if file_detail is None:
+            try:
+                file_size, file_mod_time, _ = self.get_file_stat(file_path)
+                file_date = datetime.fromtimestamp(file_mod_time)
+                file_size = file_size / (1024 * 1024)  # MB
+            except OSError as e:
+                # File vanished between the scan and now - nothing to retry
+                return {"filename": filename, "size_mb": 0, "date": None, "upload_attempts": 1,
+                        "backoff_seconds": 0, "success": False, "error": None}, e
+
+            print(f"\n--- Upload {position}/{total} ---")
             print(f"File: {filename}")
             print(f"Date: {file_date.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"Size: {file_size:.2f} MB")
 
-             # Record file details for logging
+            # Record file details for logging
             file_detail = {
                 "filename": filename,
                 "size_mb": round(file_size, 2),
                 "date": file_date.isoformat(),
                 "upload_attempts": 0,
+                "backoff_seconds": 0,
                 "success": False,
                 "error": None
             }
-            
-            start_time = time.time() 
-
-            if self.upload_to_drive(file_path):
-                successful_uploads += 1
-                file_detail["success"] = True
-                upload_time = time.time() - start_time
-                file_detail["upload_time_seconds"] = round(upload_time, 2)
-                print(f"Upload completed in {upload_time:.1f}s")
-            else:
-                failed_uploads += 1
-                file_detail["error"] = "All retry attempts failed"
-                print(f"Upload failed permanently")
+        else:
+            print(f"\n--- Retry {file_detail['upload_attempts'] + 1}/{self.max_attempts} "
+                  f"(file {position}/{total}) ---")
+            print(f"File: {filename}")
 
-            file_details.append(file_detail)
-            
-            # Save log after each upload to prevent data loss (in case of system crash)
-            self.save_upload_log()
+        file_detail["upload_attempts"] += 1
+        start_time = time.time()
+
+        try:
+            self.upload_to_destinations(file_path, service, file_detail)
+        except Exception as e:
+            return file_detail, e
+
+        file_detail["success"] = True
+        file_detail["error"] = None
+        upload_time = time.time() - start_time
+        file_detail["upload_time_seconds"] = round(upload_time, 2)
+        print(f"Upload completed in {upload_time:.1f}s ({filename})")
+
+        return file_detail, None
+
+    def upload_multiple_screenshots(self, file_list):
+        """Upload multiple screenshots"""
+        """Enhanced batch upload with retry logic and detailed reporting"""
+        if not file_list:
+            print("No files to upload")
+            return True
+        
+        # Small files go up as hourly archives, one request each
+        file_list = self.prepare_bundles(file_list)
+        # Optional re-encode stage - uses all cores, and cached outputs are reused
+        self.prepare_transcoded_uploads([file_path for file_path in file_list
+                                         if file_path not in self.bundle_members])
+        # YYYY/MM folders for --partition-by-date, created up front in batched calls
+        self.prepare_partition_folders(file_list)
+
+        total = len(file_list)
+        workers = max(1, min(self.workers, total))
+        # With --workers auto the pool is sized for the ceiling and the controller decides how much of it to use
+        controller = AdaptiveConcurrency(workers) if self.adaptive_concurrency else None
+
+        # One bucket shared by every worker replaces the old fixed sleep between files
+        rate_limiter = TokenBucket(self.rate_limit, workers)
+        # Failed files wait here for their backoff while healthy files keep going
+        retry_queue = RetryScheduler()
+
+        if controller:
+            print(f"🚀 Starting batch upload of {total} files with adaptive concurrency (1-{workers} workers)...")
+        else:
+            print(f"🚀 Starting batch upload of {total} files with {workers} worker(s)...")
+        batch_start = time.time()
+
+        if self.mirror_plan:
+            # Extra destinations send in parallel with the main upload of the same file
+            self.sink_pool = ThreadPoolExecutor(max_workers=workers * max(1, len(self.active_destinations)),
+                                                thread_name_prefix="destination")
+
+        file_details = [None] * total  # For detailed logging, in file_list order
+        fresh_files = deque(enumerate(file_list, 1))
+        in_flight = {}  # future -> (position, file_path)
+        deferred = []  # (position, file_path) stopped or never started because the deadline passed
+
+        def upload_worker(position, file_path):
+            rate_limiter.acquire()
+            # A single worker can share the main client; more need one each
+            service = self.service if workers == 1 else self.get_worker_service()
+            return self.upload_single_screenshot(file_path, position, total, service,
+                                                 file_details[position - 1])
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            while fresh_files or in_flight or retry_queue:
+                # Files not finished yet: waiting, uploading or backing off
+                self.metrics.peak("upload_queue_depth", len(fresh_files) + len(in_flight) + len(retry_queue))
+
+                if self.deadline is not None and time.monotonic() > self.deadline and (fresh_files or retry_queue):
+                    # Out of time - don't start anything new, just let in-flight uploads stop
+                    deferred.extend(retry_queue.drain())
+                    deferred.extend(fresh_files)
+                    fresh_files.clear()
+                    print(f"⏳ Time budget used up - {len(deferred)} file(s) left for the next run")
+                    if not in_flight:
+                        break
 
-            # Small delay between uploads to be respectful to the API
-            if i < len(file_list):  # Don't delay after the last file
-                time.sleep(0.5)
+                # Fill free worker slots - retries that are due first, then new files
+                while len(in_flight) < (controller.limit if controller else workers):
+                    item = retry_queue.pop_ready()
+                    if item is None:
+                        if not fresh_files:
+                            break
+                        item = fresh_files.popleft()
+                    in_flight[pool.submit(upload_worker, *item)] = item
+
+                if not in_flight:
+                    # Only retries left and none is due yet - wait for the earliest one
+                    time.sleep(retry_queue.seconds_until_next())
+                    continue
+
+                # Wake up when an upload finishes or the next retry becomes due
+                done, _ = wait(in_flight, timeout=retry_queue.seconds_until_next(),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    position, file_path = in_flight.pop(future)
+                    file_detail, error = future.result()
+                    file_details[position - 1] = file_detail
+
+                    if isinstance(error, UploadDeferred):
+                        file_detail["deferred"] = True
+                        file_detail["error"] = str(error)
+                        deferred.append((position, file_path))
+                        print(f"'{file_detail['filename']}' paused: {error}")
+                        continue
+
+                    if error is None:
+                        if controller:
+                            sent = file_detail.get("transcode", {}).get("uploaded_bytes")
+                            controller.record_success(sent or self.get_file_stat(file_path)[0])
+                        continue
+
+                    should_retry, error_category, delay = self.plan_retry(
+                        error, file_detail["upload_attempts"])
+                    file_detail["error"] = f"{error_category}: {error}"
+                    if controller and error_category == "rate_limit":
+                        controller.record_throttle()
+
+                    if should_retry and file_detail["upload_attempts"] < self.max_attempts:
+                        file_detail["backoff_seconds"] = round(file_detail["backoff_seconds"] + delay, 2)
+                        retry_queue.schedule((position, file_path), delay)
+                        self.metrics.count("retries", category=error_category)
+                        print(f"'{file_detail['filename']}' failed ({error_category}) - "
+                              f"retrying in {delay:.1f}s, other uploads continue meanwhile")
+                    else:
+                        print(f"Upload failed permanently ({file_detail['filename']}, {error_category})")
+
+        batch_time = time.time() - batch_start
+        if self.sink_pool:
+            self.sink_pool.shutdown()
+            self.sink_pool = None
+
+        # Files that never got a turn still get a record, marked as deferred
+        for position, file_path in deferred:
+            if file_details[position - 1] is None:
+                file_details[position - 1] = {"filename": os.path.basename(file_path), "size_mb": 0,
+                                              "date": None, "upload_attempts": 0, "backoff_seconds": 0,
+                                              "success": False, "error": None, "deferred": True}
+            file_details[position - 1]["deferred"] = True
+        self.last_deferred = [file_path for _, file_path in sorted(deferred)]
+        self.last_batch_details = file_details
+        if controller:
+            self.last_concurrency = controller.summary()
+        else:
+            self.last_concurrency = {"final": workers, "peak": workers, "maximum": workers,
+                                     "changes": [{"seconds": 0.0, "limit": workers, "reason": "fixed --workers"}]}
+        self.metrics.peak("upload_concurrency", self.last_concurrency["peak"])
+
+        # Each upload is already journaled - fold the journal into upload_log.json
+        self.save_upload_log()
+
+        successful_uploads = sum(1 for detail in file_details if detail["success"])
+        deferred_uploads = len(self.last_deferred)
+        failed_uploads = total - successful_uploads - deferred_uploads
+        # Deferred placeholders have 0 attempts - they must not count as -1 retries
+        total_retries = sum(max(0, detail["upload_attempts"] - 1) for detail in file_details)
+        self.metrics.count("files_uploaded", successful_uploads)
+        self.metrics.count("files_failed", failed_uploads)
 
         # Create detailed log entry
-        self.create_detailed_log_entry("batch_upload", file_details, successful_uploads, failed_uploads)
+        self.create_detailed_log_entry("batch_upload", file_details, successful_uploads, failed_uploads,
+                                       batch_time, self.last_concurrency)
         
         print(f"\nUpload Summary:")
         print(f"Successful: {successful_uploads}")
         print(f"Failed: {failed_uploads}")
-        print(f"Total processed: {len(file_list)}")
+        if deferred_uploads:
+            print(f"Deferred to next run: {deferred_uploads}")
+        for sink in self.active_destinations or []:
+            results = [detail["destinations"][sink.name] for detail in file_details
+                       if sink.name in detail.get("destinations", {})]
+            if results:
+                copied = sum(1 for result in results if result["success"])
+                print(f"Copied to {sink.name}: {copied} ({len(results) - copied} failed)")
+        print(f"Total processed: {total}")
+        print(f"Retries: {total_retries}")
         
-        success_rate = (successful_uploads / len(file_list)) * 100
-        print(f"Success rate: {success_rate:.1f}%")
+        attempted = successful_uploads + failed_uploads
+        success_rate = (successful_uploads / attempted) * 100 if attempted else 100.0
+        print(f"Success rate: {success_rate:.1f}%" + (" (deferred files not counted)" if deferred_uploads else ""))
+        print(f"Batch time: {batch_time:.1f}s ({total / batch_time if batch_time > 0 else 0:.2f} files/s)")
+        if controller:
+            print(f"Concurrency: ended at {controller.limit}, peak {controller.peak_limit} "
+                  f"({len(controller.history) - 1} adjustment(s))")
+        if self.transport:
+            connection_stats = self.transport.snapshot()
+            print(f"Connections: {connection_stats['connections_opened']} opened for "
+                  f"{connection_stats['requests']} requests "
+                  f"(avg setup {connection_stats['avg_connect_ms']} ms)")
 
         return failed_uploads == 0
     
+    def start_folder_watcher(self, changed_paths):
+        """
+        Start filesystem event notifications for the source folders
+
+        Uses the optional watchdog package (inotify on Linux,
+        ReadDirectoryChangesW on Windows). Every created/modified/moved
+        screenshot path is put on the `changed_paths` queue.
+
+        Returns:
+            Observer or None: The running observer, or None if watchdog
+                              isn't installed (caller falls back to polling)
+        """
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print(f"watchdog not installed - polling the folder every {WATCH_POLL_INTERVAL:.0f}s instead")
+            return None
+
+        patterns = self.patterns
+
+        class ScreenshotEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                # Moves report the new name in dest_path
+                for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+                    if path and is_screenshot_name(os.path.basename(path), patterns):
+                        changed_paths.put(path)
+
+        observer = Observer()
+        handler = ScreenshotEventHandler()
+        for folder in self.get_source_folders():
+            if os.path.isdir(folder):
+                observer.schedule(handler, folder, recursive=self.recursive)
+        observer.start()
+        print("Watching for filesystem events")
+        return observer
+
+    def poll_local_changes(self):
+        """
+        Rescan the source folders and return screenshots that are new or changed
+
+        Compares against the index and stat cache, so it works without any
+        filesystem event support.
+        """
+        changed = []
+        try:
+            for file_path, stat in self.iter_local_screenshots():
+                # Known files are either synced (in the index) or were seen changed this run
+                if self.local_stats.get(file_path) != stat and self.local_index.get(file_path) != list(stat):
+                    changed.append(file_path)
+        except OSError as e:
+            print(f"Could not scan local folders: {e}")
+        return changed
+
+    def watch(self):
+        """
+        Long-running daemon: upload screenshots within seconds of them landing
+
+        Authenticates and scans Drive once, catches up on anything missing,
+        then reacts to filesystem events (or polling). A file is only
+        picked up after it has stopped changing for WATCH_SETTLE_SECONDS,
+        so half-written captures are never uploaded. Stop with Ctrl+C.
+        """
+        import queue
+
+        mode = "watch"
+        print("\n🚀 Starting Screenshot Auto-Uploader (watch mode)")
+        print(f"📂 Local folder: {', '.join(self.get_source_folders())}")
+
+        try:
+            if not self.authenticate_google_drive():
+                raise Exception("Authentication failed")
+            if not self.scan_google_drive_folder():
+                raise Exception("Failed to scan Google Drive folder")
+        except Exception as e:
+            print(f"\nError starting watch mode: {e}")
+            self.log_execution(mode, False, 0, str(e))
+            return
+
+        # Catch up on anything that landed while we weren't running
+        changed_screenshots = self.scan_local_changes()
+        catch_up_failed = []  # Retried from the watch loop if the catch-up batch hits a network error
+        try:
+            if changed_screenshots:
+                missing_screenshots = self.get_missing_screenshots(changed_screenshots)
+                if missing_screenshots:
+                    success = self.upload_multiple_screenshots(missing_screenshots)
+                    self.log_execution(mode, success, len(missing_screenshots))
+        except Exception as e:
+            print(f"\nError catching up: {e} - retrying in {WATCH_FAILED_RETRY_SECONDS:.0f}s")
+            self.log_execution(mode, False, len(changed_screenshots), str(e))
+            catch_up_failed = changed_screenshots
+        self.save_local_index()
+
+        changed_paths = queue.Queue()
+        observer = self.start_folder_watcher(changed_paths)
+        poll_interval = WATCH_RESCAN_INTERVAL if observer else WATCH_POLL_INTERVAL
+        last_poll = time.monotonic()
+        last_drive_sync = time.monotonic()
+        pending = {}  # path -> {"stat": (size, mtime, inode), "ready_at": monotonic time}
+
+        def note_change(path, delay=WATCH_SETTLE_SECONDS):
+            # (Re)start the settle timer only if the file actually changed since we last looked
+            try:
+                st = os.stat(path)
+            except OSError:
+                pending.pop(path, None)  # Deleted or moved away
+                return
+            stat = (st.st_size, st.st_mtime, st.st_ino)
+            entry = pending.get(path)
+            if entry is None or entry["stat"] != stat:
+                pending[path] = {"stat": stat, "ready_at": time.monotonic() + delay}
+
+        for path in catch_up_failed:
+            note_change(path, WATCH_FAILED_RETRY_SECONDS)
+
+        print(f"\n👀 Watching {', '.join(self.get_source_folders())} - press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(WATCH_TICK_SECONDS)
+
+                while not changed_paths.empty():
+                    note_change(changed_paths.get_nowait())
+                if self.coordinator:
+                    # Files found by startup/shutdown runs that started while we were watching
+                    for path in self.coordinator.take_handoffs():
+                        note_change(path, 0)
+
+                if time.monotonic() - last_poll >= poll_interval:
+                    for path in self.poll_local_changes():
+                        if path not in pending:
+                            note_change(path)
+                    last_poll = time.monotonic()
+
+                # Pick up files added/removed in Drive from elsewhere (cheap delta via Changes API)
+                if time.monotonic() - last_drive_sync >= WATCH_RESCAN_INTERVAL:
+                    if self.scan_google_drive_folder():
+                        last_drive_sync = time.monotonic()
+                    else:
+                        # Network hiccup - try again soon rather than in another full interval
+                        last_drive_sync = time.monotonic() - WATCH_RESCAN_INTERVAL + WATCH_FAILED_RETRY_SECONDS
+
+                # Re-stat pending files: anything still being written pushes its timer back
+                for path in list(pending):
+                    note_change(path)
+
+                now = time.monotonic()
+                ready = [path for path, entry in pending.items() if entry["ready_at"] <= now]
+                if not ready:
+                    continue
+
+                for path in ready:
+                    self.local_stats[path] = pending.pop(path)["stat"]
+                try:
+                    changed = self.get_changed_screenshots(ready)
+                    missing_screenshots = self.get_missing_screenshots(changed) if changed else []
+
+                    if missing_screenshots:
+                        success = self.upload_multiple_screenshots(missing_screenshots)
+                        self.log_execution(mode, success, len(missing_screenshots))
+
+                        # Give failed files another chance later instead of dropping them
+                        for path in missing_screenshots:
+                            if self.local_index.get(path) != list(self.local_stats[path]):
+                                note_change(path, WATCH_FAILED_RETRY_SECONDS)
+                except Exception as e:
+                    # e.g. a dropped connection while listing a partition - keep the daemon alive
+                    print(f"\nError handling new files: {e} - retrying in {WATCH_FAILED_RETRY_SECONDS:.0f}s")
+                    self.log_execution(mode, False, len(ready), str(e))
+                    for path in ready:
+                        note_change(path, WATCH_FAILED_RETRY_SECONDS)
+                self.save_local_index()
+
+        except KeyboardInterrupt:
+            print("\nWatch mode stopped by user")
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            self.save_upload_log()
+            self.save_local_index()
+
+    def hand_off_to_active_run(self, mode, if_running="handoff"):
+        """
+        Called when another uploader run holds the lock
+
+        Scans the local folders (cheap - no Google libraries) and hands
+        the new files to the active run. If that run is just finishing,
+        waits for it to let go and then carries on as the active run.
+
+        Returns:
+            bool: True if this process should now run itself, False to exit
+        """
+        coordinator = RunCoordinator()
+        info = coordinator.read_run_info() or {}
+        print(f"Another uploader run is active (pid {info.get('pid', '?')}, {info.get('mode', '?')} mode, "
+              f"started {info.get('started', '?')})")
+        if if_running == "exit":
+            print("Leaving the uploads to it (--if-running exit)")
+            return False
+
+        # Read-only look at the index the active run keeps - nothing is written while it holds the lock
+        self.local_index = self.load_local_index()
+        changed_screenshots = self.scan_local_changes()
+        reply = {"accepted": 0} if not changed_screenshots else coordinator.hand_off(changed_screenshots)
+        if reply and not reply.get("closing"):
+            print(f"🤝 Handed {reply['accepted']} new file(s) to the active run"
+                  + (f" ({reply['already_claimed']} it already had)" if reply.get("already_claimed") else ""))
+            if mode != "watch":
+                return False
+            # A watcher is meant to keep running - start watching once the other run is done
+            print("Watch mode will start when it finishes...")
+            coordinator.wait_for_release(mode, timeout=None)
+            self.coordinator = coordinator
+            self.load_state()  # Pick up everything the other run wrote
+            return True
+
+        # It is finishing (or not answering) - take over once its lock is free
+        print("Active run is finishing - waiting for it to exit...")
+        if coordinator.wait_for_release(mode):
+            self.coordinator = coordinator
+            self.load_state()  # Pick up everything the other run wrote
+            return True
+        print("Active run did not finish in time - leaving these files for the next run")
+        return False
+
+    def process_handoffs(self, mode):
+        """
+        Upload files that other invocations handed over while this run was busy
+
+        Keeps going until a check finds nothing new, then closes the
+        coordinator so later invocations wait for the lock instead.
+        """
+        if not self.coordinator:
+            return
+        try:
+            closing = False
+            while True:
+                handed_off = self.coordinator.take_handoffs(close=closing)
+                if handed_off and self.deadline is not None and time.monotonic() >= self.deadline:
+                    # Out of time - the files are still unsynced in local_index, so the next run finds them
+                    print(f"\n⏳ No time left for {len(handed_off)} handed-over file(s) - leaving them for the next run")
+                elif handed_off:
+                    self.upload_handed_off(handed_off, mode)
+                if closing:
+                    return
+                closing = not handed_off
+        except Exception as e:
+            print(f"\nError uploading handed-over files: {e}")
+            self.log_execution(mode, False, 0, str(e))
+
+    def upload_handed_off(self, file_list, mode):
+        """Plan and upload files from another run, like watch mode does for new files"""
+        print(f"\n📥 {len(file_list)} file(s) handed over by another uploader run")
+        ready = []
+        for path in file_list:
+            self.local_stats.pop(path, None)  # Re-stat: the other run's view may be stale
+            try:
+                self.get_file_stat(path)
+            except OSError:
+                continue
+            ready.append(path)
+        ready = self.get_changed_screenshots(ready)
+        if not ready:
+            print("All of them are already synced")
+            return
+
+        if self.service is None:
+            if not self.authenticate_google_drive():
+                raise Exception("Authentication failed")
+            if not self.scan_google_drive_folder():
+                raise Exception("Failed to scan Google Drive folder")
+        missing_screenshots = self.get_missing_screenshots(ready)
+        if missing_screenshots:
+            success = self.upload_multiple_screenshots(missing_screenshots)
+            self.log_execution(mode, success, len(missing_screenshots))
+        self.save_local_index()
+
     def run(self):
         """Main execution function"""
         mode = "manual"  # Default mode
@@ -531,43 +4136,96 @@ class ScreenshotUploader:
                     break
 
         print("\n🚀 Starting Screenshot Auto-Uploader (Drive Sync version)")
-        print(f"📂 Local folder: {LOCAL_FOLDER}")
+        print(f"📂 Local folder: {', '.join(self.get_source_folders())}")
         print(f"☁️  Google Drive folder: AI Road → Capturas de pantalla")
 
         files_processed = 0
         error_occurred = None
+        run_start = time.time()
+        if self.time_budget:
+            # Leave a little room at the end for saving logs and state
+            self.deadline = time.monotonic() + self.time_budget - BUDGET_SAFETY_SECONDS
+            print(f"⏳ Time budget: {self.time_budget:g}s, {self.priority} files first")
+
+        previous_deferred = self.load_deferred_uploads()
         
         try:
-            # Authenticate with Google Drive
-            if not self.authenticate_google_drive():
-               raise Exception("Authentication failed")
+            # Get all screenshots in local folder first - it's cheap, and if
+            # nothing changed we can skip Google Drive entirely
+            with self.metrics.phase("scan_local"):
+                changed_screenshots = self.scan_local_changes()
+            self.metrics.count("local_files", self.local_file_count)
+            self.metrics.count("local_files_changed", len(changed_screenshots))
 
-            # Scan Google Drive folder first
-            if not self.scan_google_drive_folder():
-                raise Exception("Failed to scan Google Drive folder")
-            
-            # Get all screenshots in local folder
-            all_local_screenshots = self.get_all_screenshots()
-            if not all_local_screenshots:
+            if not self.local_file_count:
+                self.save_local_index()  # Drop index entries for files that were deleted
+                self.metrics.success = True
                 self.log_execution(mode, True, 0)  # Success with 0 files
                 print("No screenshots found in local folder")
                 return
+
+            if not changed_screenshots:
+                self.save_local_index()
+                self.metrics.success = True
+                self.log_execution(mode, True, 0)  # Success with 0 files
+                print("Nothing changed locally since the last sync - skipping Google Drive")
+                print(f"Finished in {time.time() - run_start:.2f}s without loading the Google libraries")
+                return
+
+            # Authenticate with Google Drive
+            with self.metrics.phase("authenticate"):
+                if not self.authenticate_google_drive():
+                   raise Exception("Authentication failed")
+
+            # Scan Google Drive folder
+            with self.metrics.phase("scan_drive"):
+                if not self.scan_google_drive_folder():
+                    raise Exception("Failed to scan Google Drive folder")
         
             # Find screenshots missing from Google Drive
-            missing_screenshots = self.get_missing_screenshots(all_local_screenshots)
+            with self.metrics.phase("diff"):
+                missing_screenshots = self.get_missing_screenshots(changed_screenshots)
             
             # Show preview and ask for confirmation
 #           if not self.show_upload_preview(missing_screenshots):
 #               print("Upload process stopped.")
 #               return
 
+            if self.coordinator:
+                # Another run may hand these over too - claiming them here means they are only sent once
+                missing_screenshots = self.coordinator.claim(missing_screenshots)
+            carried_over = previous_deferred["files"] if previous_deferred else None
+            missing_screenshots = self.order_by_priority(missing_screenshots, carried_over)
+            if carried_over:
+                picked_up = len(set(carried_over).intersection(missing_screenshots))
+                print(f"📌 {picked_up} file(s) the {previous_deferred['mode']} run at "
+                      f"{previous_deferred['timestamp']} had no time for go first")
+            deferred_screenshots = []
+            if self.deadline is not None and missing_screenshots:
+                missing_screenshots, deferred_screenshots = self.fit_time_budget(missing_screenshots)
+
             # Count files that will be processed
             files_processed = len(missing_screenshots)
 
             # Upload all missing screenshots
-            success = self.upload_multiple_screenshots(missing_screenshots)
+            with self.metrics.phase("upload"):
+                self.last_deferred = []
+                success = self.upload_multiple_screenshots(missing_screenshots)
+
+                # Remember what is synced so the next run can skip it without asking Drive
+                self.save_local_index()
+            self.metrics.success = success
+
+            # Whatever didn't fit is picked up by the next run (partial uploads resume from their last chunk)
+            deferred_screenshots = self.last_deferred + deferred_screenshots
+            self.metrics.count("files_deferred", len(deferred_screenshots))
+            self.save_deferred_uploads(mode, deferred_screenshots)
             
-            if success:
+            if success and deferred_screenshots:
+                print(f"\nUploads that fit in the time budget completed - "
+                      f"{len(deferred_screenshots)} left for the next run")
+                self.log_execution(mode, True, files_processed)
+            elif success:
                 print("\nAll uploads completed successfully!")
                 print("Your screenshots are now ready to download on your phone!")
                 self.log_execution(mode, True, files_processed)
@@ -575,19 +4233,86 @@ class ScreenshotUploader:
                 print("\nSome uploads failed - check the log above")
         except Exception as e:
             error_occurred = str(e)
+            self.metrics.success = False
             print(f"\nError during execution: {error_occurred}")
             self.log_execution(mode, False, files_processed, error_occurred)
+        finally:
+            self.process_handoffs(mode)
+            self.metrics.print_summary()
+            if self.metrics_file:
+                try:
+                    self.metrics.export(self.metrics_file)
+                    print(f"Metrics written to {self.metrics_file}")
+                except Exception as e:
+                    print(f"Could not write metrics: {e}")
 
 if __name__ == "__main__":
     args = parse_arguments() # Parse what the user (or Windows) told us to do
 
+    if args.stats:
+        show_run_stats(args.days) # Just report on past runs - no uploading
+        sys.exit(0)
+
     print(f"Starting Google Drive sync uploader in {args.mode} mode...")
     # Create our uploader object (your existing class)
-    uploader = ScreenshotUploader()
+    # State files are only read once we know we're the active run (see below)
+    uploader = ScreenshotUploader(load_state=False)
 
     # Modify the uploader behavior based on mode, before it runs
-    if args.mode in ['startup', 'shutdown']:
+    if args.mode in ['startup', 'shutdown', 'watch']:
         uploader.silent_mode = True # Don't ask questions, just do the work
         print(f"Running in {args.mode} mode - automated execution")
 
-    uploader.run() # Your existing logic takes over from here
+    if args.workers is None:
+        uploader.adaptive_concurrency = True
+        uploader.workers = ADAPTIVE_MAX_WORKERS
+    else:
+        uploader.workers = args.workers
+    uploader.rate_limit = args.rate_limit
+    uploader.chunk_size = max(1, args.chunk_size) * 1024 * 1024
+    uploader.full_scan = args.full_scan
+    uploader.partition_by_date = args.partition_by_date
+    uploader.time_budget = args.time_budget
+    if args.bundle_small_files:
+        uploader.bundle_threshold = args.bundle_small_files * 1024
+    if uploader.time_budget is None and args.mode == 'shutdown':
+        uploader.time_budget = SHUTDOWN_TIME_BUDGET  # Windows won't wait forever at shutdown
+    uploader.priority = args.priority or ("newest" if uploader.time_budget else "oldest")
+    uploader.source_folders = args.source
+    if args.pattern:
+        uploader.patterns = args.pattern
+    uploader.recursive = args.recursive
+    uploader.destinations = ([DriveMirrorSink(*spec.split(',', 1)) for spec in args.mirror_drive]
+                             + [LocalBackupSink(folder) for folder in args.backup_dir])
+
+    uploader.metrics_file = args.metrics_file
+    uploader.transcode_format = args.transcode
+    uploader.transcode_quality = max(1, min(args.quality, 100))
+
+    # Only one run uploads at a time; a second one hands its new files over and exits
+    coordinator = RunCoordinator()
+    if coordinator.acquire(args.mode):
+        uploader.coordinator = coordinator
+        uploader.load_state()
+    elif not uploader.hand_off_to_active_run(args.mode, args.if_running):
+        sys.exit(0)
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        if args.mode == 'watch':
+            uploader.watch() # Keeps running until stopped
+        else:
+            uploader.run() # Your existing logic takes over from here
+    finally:
+        uploader.coordinator.release()
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"\nProfile saved to {args.profile} - top functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
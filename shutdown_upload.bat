@@ -5,7 +5,8 @@ echo Time: %date% %time%
 echo ================================================
 
 cd /d "C:\Users\USUARIO\OneDrive\Documentos\My_Projects\Projects\Automation_Screen_Captures"
-python fixed_uploader.py --mode shutdown --silent
+REM --time-budget: seconds the upload may take before Windows cuts it off (unfinished files go next run)
+python fixed_uploader.py --mode shutdown --silent --time-budget 60
 
 echo.
 echo ================================================
@@ -27,10 +28,10 @@ if exist execution_log.txt (
     echo Looking in: %cd%
 )
 
-if exist detailed_execution_log.json (
-    echo ✅ Found detailed_execution_log.json
+if exist detailed_execution_log.jsonl (
+    echo ✅ Found detailed_execution_log.jsonl
 ) else (
-    echo ❌ detailed_execution_log.json not found
+    echo ❌ detailed_execution_log.jsonl not found
 )
 
 echo Upload completed at %date% %time% >> upload_history.log
@@ -34,10 +34,10 @@ if exist execution_log.txt (
     echo Looking in: %cd%
 )
 
-if exist detailed_execution_log.json (
-    echo ✅ Found detailed_execution_log.json
+if exist detailed_execution_log.jsonl (
+    echo ✅ Found detailed_execution_log.jsonl
 ) else (
-    echo ❌ detailed_execution_log.json not found
+    echo ❌ detailed_execution_log.jsonl not found
 )
 
 echo.
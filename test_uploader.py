@@ -0,0 +1,286 @@
+"""
+Regression tests for ScreenshotUploader against the in-process fake Drive
+
+Each test runs the uploader in its own temp folder (the state files are
+relative to the working directory) with fake_drive.FakeDrive as the
+backend, so no Google account or network is needed. The Google client
+libraries are not needed either: fake_drive brings stand-ins for the few
+classes uploads use when they aren't installed.
+
+Run with:
+    python -m pytest test_uploader.py
+"""
+import hashlib
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import fixed_uploader
+from fake_drive import FakeDrive, MediaFileUpload, make_http_error
+
+
+def make_capture(path, size, mtime=1_000_000_000, data=None):
+    """Write `size` random bytes (or `data`) to `path` with a fixed mtime; returns the bytes"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = os.urandom(size) if data is None else data
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return data
+
+
+def drive_contents(fake):
+    """Drive file name -> MD5 of its content (fails if a name is there twice)"""
+    names = [resource['name'] for resource in fake.files.values()]
+    assert len(names) == len(set(names)), f"duplicate Drive files: {sorted(names)}"
+    return {resource['name']: resource['md5Checksum'] for resource in fake.files.values()}
+
+
+def md5_of(data):
+    return hashlib.md5(data).hexdigest()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Temp working directory with the uploader's paths pointed into it"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fixed_uploader, "LOCAL_FOLDER", str(tmp_path / "screenshots"))
+    monkeypatch.setattr(fixed_uploader, "DETAILED_LOG_PATH", str(tmp_path / "detailed_execution_log.jsonl"))
+    monkeypatch.setattr(fixed_uploader, "EXECUTION_LOG_PATH", str(tmp_path / "execution_log.txt"))
+    return tmp_path
+
+
+@pytest.fixture
+def fake():
+    return FakeDrive()
+
+
+@pytest.fixture
+def new_uploader(fake):
+    """Factory for uploaders wired to the fake Drive, like benchmark_uploader does"""
+    def build(**settings):
+        uploader = fixed_uploader.ScreenshotUploader()
+        uploader.silent_mode = True
+        uploader.drive_backend = fake.client
+        uploader.rate_limit = 0
+        uploader.workers = 1
+        for name, value in settings.items():
+            setattr(uploader, name, value)
+        return uploader
+    return build
+
+
+def test_upload_then_nothing_left(workdir, fake, new_uploader):
+    local = fixed_uploader.LOCAL_FOLDER
+    contents = {f"Screenshot_{i}.jpg": make_capture(os.path.join(local, f"Screenshot_{i}.jpg"), 1000 + i)
+                for i in range(3)}
+
+    new_uploader().run()
+    assert drive_contents(fake) == {name: md5_of(data) for name, data in contents.items()}
+
+    requests_before = fake.stats["files_created"]
+    new_uploader(full_scan=True).run()
+    assert fake.stats["files_created"] == requests_before
+
+
+def test_identical_files_in_one_batch_upload_once(workdir, fake, new_uploader):
+    local = fixed_uploader.LOCAL_FOLDER
+    data = make_capture(os.path.join(local, "a.jpg"), 5000)
+    make_capture(os.path.join(local, "b.jpg"), 0, mtime=1_000_000_001, data=data)
+
+    new_uploader().run()
+    assert drive_contents(fake) == {"a.jpg": md5_of(data)}
+    assert fake.stats["bytes_received"] == len(data)
+
+    # The next run sees b.jpg as a renamed copy of a.jpg and still sends nothing
+    new_uploader().run()
+    assert fake.stats["files_created"] == 1
+
+
+def test_retry_plan_for_drive_errors(workdir, new_uploader):
+    uploader = new_uploader()
+    assert uploader.plan_retry(make_http_error(429, "Rate Limit Exceeded", retry_after=7), 1)[:2] == \
+        (True, "rate_limit")
+    assert uploader.plan_retry(make_http_error(429, "Rate Limit Exceeded", retry_after=7), 1)[2] >= 7
+    assert uploader.plan_retry(make_http_error(503, "Backend Error"), 1)[:2] == (True, "server")
+    assert uploader.plan_retry(make_http_error(403, "Insufficient permission"), 1)[0] is False
+
+
+def test_journal_replay(workdir, new_uploader):
+    writer = new_uploader()
+    writer.record_upload("a.jpg", 1.0)
+    writer.record_upload("b.jpg", 2.0)
+    writer.journal.close()  # Simulates a crash: the snapshot was never rewritten
+    assert not os.path.exists(fixed_uploader.LOG_FILE)
+
+    # A write torn by a crash leaves half a line at the end
+    with open(fixed_uploader.UPLOAD_JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"key": "c.jpg", "val')
+
+    reader = new_uploader()
+    assert reader.uploaded_files == {"a.jpg": 1.0, "b.jpg": 2.0}
+
+
+def test_journal_replay_skips_malformed_entries(workdir, new_uploader):
+    writer = new_uploader()
+    writer.record_upload("a.jpg", 1.0)
+    writer.journal.close()
+    with open(fixed_uploader.UPLOAD_JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        for line in ('[1, 2]', '"text"', '{"key": "x.jpg"}', '{"value": 3}', '{"key": [1], "value": 3}', 'null'):
+            f.write(line + "\n")
+    writer = new_uploader()
+    writer.record_upload("b.jpg", 2.0)
+    writer.journal.close()
+
+    reader = new_uploader()
+    assert reader.uploaded_files == {"a.jpg": 1.0, "b.jpg": 2.0}
+    assert reader.journal.entries == 2
+
+
+def test_journal_replays_over_snapshot(workdir, new_uploader):
+    with open(fixed_uploader.LOG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"a.jpg": 1.0, "b.jpg": 2.0}, f)
+    writer = new_uploader()
+    writer.record_upload("b.jpg", 3.0)
+    writer.journal.close()
+
+    assert new_uploader().uploaded_files == {"a.jpg": 1.0, "b.jpg": 3.0}
+
+
+def test_resume_after_deadline(workdir, monkeypatch, new_uploader):
+    # Slow enough that the budget runs out in the middle of the uploads
+    fake = FakeDrive(bandwidth_mbps=2.0)
+    monkeypatch.setattr(fixed_uploader, "BUDGET_SAFETY_SECONDS", 0)
+    monkeypatch.setattr(fixed_uploader, "estimate_upload_model",
+                        lambda: {"overhead": 0, "mb_per_second": 100, "parallelism": 1, "samples": 0})
+    local = fixed_uploader.LOCAL_FOLDER
+    contents = {f"Screenshot_{i}.jpg": make_capture(os.path.join(local, f"Screenshot_{i}.jpg"),
+                                                    900 * 1024, mtime=1_000_000_000 + i)
+                for i in range(4)}
+    total_bytes = sum(len(data) for data in contents.values())
+
+    new_uploader(drive_backend=fake.client, time_budget=0.6, chunk_size=256 * 1024).run()
+    assert len(fake.files) < len(contents)
+    with open(fixed_uploader.DEFERRED_UPLOADS_FILE, encoding='utf-8') as f:
+        assert json.load(f)["files"]
+    with open(fixed_uploader.RESUME_STATE_FILE, encoding='utf-8') as f:
+        paused = list(json.load(f).values())
+    assert paused and paused[0]["offset"] > 0
+
+    new_uploader(drive_backend=fake.client, chunk_size=256 * 1024).run()
+    assert drive_contents(fake) == {name: md5_of(data) for name, data in contents.items()}
+    # The paused upload carried on from its offset instead of starting over
+    assert fake.stats["bytes_received"] == total_bytes
+    assert not os.path.exists(fixed_uploader.DEFERRED_UPLOADS_FILE)
+
+
+def save_resume_entry(path, uri, offset):
+    """Write the resume state an interrupted run leaves behind"""
+    size, mtime = os.path.getsize(path), os.path.getmtime(path)
+    with open(fixed_uploader.RESUME_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({path: {"uri": uri, "offset": offset, "size": size, "mtime": mtime,
+                          "updated": 9_999_999_999}}, f)
+
+
+def test_resume_continues_from_drive_offset(workdir, fake, new_uploader):
+    path = os.path.join(fixed_uploader.LOCAL_FOLDER, "Screenshot_1.jpg")
+    data = make_capture(path, 5000)
+    # The killed run got two chunks to Drive but only saved the offset after the first
+    request = fake.client().files().create(
+        body={'name': "Screenshot_1.jpg", 'parents': [fixed_uploader.DRIVE_FOLDER_ID]},
+        media_body=MediaFileUpload(path, mimetype="image/jpeg", chunksize=1024, resumable=True))
+    request.next_chunk()
+    request.next_chunk()
+    save_resume_entry(path, request.resumable_uri, 1024)
+
+    new_uploader(chunk_size=1024).run()
+    assert drive_contents(fake) == {"Screenshot_1.jpg": md5_of(data)}
+    assert fake.stats["bytes_received"] == len(data)
+
+
+def test_resume_restarts_expired_session(workdir, fake, new_uploader):
+    path = os.path.join(fixed_uploader.LOCAL_FOLDER, "Screenshot_1.jpg")
+    data = make_capture(path, 5000)
+    save_resume_entry(path, "fake://upload/expired", 2048)
+
+    new_uploader(chunk_size=1024).run()
+    assert drive_contents(fake) == {"Screenshot_1.jpg": md5_of(data)}
+    assert not os.path.exists(fixed_uploader.RESUME_STATE_FILE) or \
+        path not in json.load(open(fixed_uploader.RESUME_STATE_FILE, encoding='utf-8'))
+
+
+def test_handoff_to_active_run(workdir, fake, new_uploader):
+    local = fixed_uploader.LOCAL_FOLDER
+    contents = {f"Screenshot_{i}.jpg": make_capture(os.path.join(local, f"Screenshot_{i}.jpg"), 1000 + i)
+                for i in range(2)}
+
+    active = new_uploader()
+    coordinator = fixed_uploader.RunCoordinator()
+    assert coordinator.acquire("manual")
+    active.coordinator = coordinator
+    try:
+        # A second invocation sees the lock, hands its files over and exits
+        assert not fixed_uploader.RunCoordinator().acquire("startup")
+        assert new_uploader().hand_off_to_active_run("startup") is False
+        assert not fake.files
+
+        active.process_handoffs("manual")
+    finally:
+        coordinator.release()
+
+    assert drive_contents(fake) == {name: md5_of(data) for name, data in contents.items()}
+    # The lock is free again for the next run
+    follower = fixed_uploader.RunCoordinator()
+    assert follower.acquire("manual")
+    follower.release()
+
+
+def test_same_name_in_two_sources(workdir, fake, new_uploader):
+    first = os.path.join(str(workdir), "a")
+    second = os.path.join(str(workdir), "b")
+    data_a = make_capture(os.path.join(first, "shot.jpg"), 1000)
+    data_b = make_capture(os.path.join(second, "shot.jpg"), 2000)
+
+    new_uploader(source_folders=[first, second]).run()
+    assert drive_contents(fake) == {"shot.jpg": md5_of(data_a), "b__shot.jpg": md5_of(data_b)}
+
+    new_uploader(source_folders=[first, second], full_scan=True).run()
+    assert drive_contents(fake) == {"shot.jpg": md5_of(data_a), "b__shot.jpg": md5_of(data_b)}
+    assert fake.stats["files_created"] == 2
+
+
+def test_recursive_name_clash_is_refused(workdir, fake, new_uploader):
+    local = fixed_uploader.LOCAL_FOLDER
+    data_top = make_capture(os.path.join(local, "sub__shot.jpg"), 1000)
+    data_sub = make_capture(os.path.join(local, "sub", "shot.jpg"), 2000)
+    data_other = make_capture(os.path.join(local, "other", "shot.jpg"), 3000)
+
+    for _ in range(2):
+        new_uploader(recursive=True, full_scan=True).run()
+        # sub/shot.jpg would also be "sub__shot.jpg" - it must not replace the top-level file
+        assert drive_contents(fake) == {"sub__shot.jpg": md5_of(data_top),
+                                        "other__shot.jpg": md5_of(data_other)}
+    assert md5_of(data_sub) not in drive_contents(fake).values()
+
+
+def test_overlapping_sources_are_walked_once(workdir, monkeypatch, new_uploader):
+    local = fixed_uploader.LOCAL_FOLDER
+    game = os.path.join(local, "Game")
+    make_capture(os.path.join(local, "top.jpg"), 100)
+    make_capture(os.path.join(game, "shot.jpg"), 100)
+    make_capture(os.path.join(game, "clips", "clip.jpg"), 100)
+
+    uploader = new_uploader(source_folders=[local, game], recursive=True)
+    scan_directory = uploader.scan_directory
+
+    def windows_scan_directory(path):
+        # Like scandir on Windows: subfolder stats come back with st_ino 0
+        files, subfolders = scan_directory(path)
+        return files, [(sub, SimpleNamespace(st_dev=st.st_dev, st_ino=0)) for sub, st in subfolders]
+    monkeypatch.setattr(uploader, "scan_directory", windows_scan_directory)
+
+    paths = [path for path, _ in uploader.iter_local_screenshots()]
+    assert sorted(paths) == sorted(set(paths))
+    assert len(paths) == 3